@@ -0,0 +1,73 @@
+"""
+Enrichment throughput benchmark against the local Spotify API stand-in (no credentials / network needed):
+enriches a synthetic history through the real SpotifyClient (rate limiter, retries, deferred retries) and reports
+entries/s, API requests/s, rate limiting and server errors.
+
+Run from the repository root: python -m benchmarks.enrichment_throughput [--entries N] [--workers N] [--latency-ms N] ...
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from spotipy.cache_handler import MemoryCacheHandler
+
+from benchmarks.spotify_api_server import LocalSpotifyApi, generate_catalog, start_server
+from enricher import enrich_spotify_entries
+from spotify.spotify_client import SpotifyClient
+from spotify.spotify_listening_history import SpotifyStreamingEntry
+from utils.rate_limiter import RateLimiter
+
+
+def build_entries(count: int, distinct: int, artists: int, catalog_size: int) -> list:
+    # a real history repeats the same tracks (of a limited number of artists) a lot; every 7th distinct track is not in the catalog
+    catalog_artists = max(catalog_size // 10, 1)
+    entries = []
+    for i in range(count):
+        track = i % distinct
+        artist = track % min(artists, catalog_artists)
+        catalog_track = (artist + (track // min(artists, catalog_artists)) * catalog_artists) % catalog_size
+        name = f"Track {catalog_track}" if track % 7 else f"Unknown {track}"
+        entries.append(SpotifyStreamingEntry(f"2024-01-01T00:00:{i % 60:02d}.000Z", name, f"Artist {artist}"))
+    return entries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enrichment throughput against the local Spotify API stand-in")
+    parser.add_argument("--entries", type=int, default=2000, help="Number of history entries (default: 2000)")
+    parser.add_argument("--distinct", type=int, default=500, help="Number of distinct tracks in the history (default: 500)")
+    parser.add_argument("--artists", type=int, default=500, help="Number of distinct artists in the history (default: 500)")
+    parser.add_argument("--catalog", type=int, default=5000, help="Size of the generated catalog (default: 5000)")
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent searches (default: 1)")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Server response latency (default: 50)")
+    parser.add_argument("--max-requests-per-second", type=float, help="Server rate limit (default: none)")
+    parser.add_argument("--error-ratio", type=float, default=0.0, help="Ratio of server errors (default: 0)")
+    parser.add_argument("--client-rate", type=float, default=10.0, help="Client limiter requests per second (default: 10)")
+    parser.add_argument("--client-burst", type=float, default=1.0, help="Client limiter burst (default: 1)")
+    parser.add_argument("--artist-prefetch", type=int, default=0, help="Prefetch the catalog of the artists with this many distinct tracks (default: 0, disabled)")
+    args = parser.parse_args()
+
+    catalog = generate_catalog(args.catalog)
+    api = LocalSpotifyApi(catalog, latency_ms=args.latency_ms, max_requests_per_second=args.max_requests_per_second,
+                          error_ratio=args.error_ratio)
+    server = start_server(api)
+    host, port = server.server_address
+
+    client = SpotifyClient("local", "local", "US", 5, 10, rate_limiter=RateLimiter(args.client_rate, burst=args.client_burst),
+                           api_url=f"http://{host}:{port}/v1/", auth_url=f"http://{host}:{port}/api/token",
+                           token_cache_handler=MemoryCacheHandler())  # the stand-in token never lands in a .cache file
+    entries = build_entries(args.entries, args.distinct, args.artists, args.catalog)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        output = enrich_spotify_entries(entries, client, args.workers, artist_prefetch_min_tracks=args.artist_prefetch)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    limiter = client.rate_limiter.get_stats()
+    server_stats = api.get_stats()
+    print(f"{args.entries} entries ({args.distinct} distinct), {args.workers} workers, {args.latency_ms:.0f} ms latency: {elapsed:.2f}s")
+    print(f"  {args.entries / elapsed:.1f} entries/s, {server_stats['requests'] / elapsed:.1f} API requests/s")
+    print(f"  enriched {len(output.processed)}, errors {len(output.errors)}")
+    print(f"  server: {server_stats['requests']} requests, {server_stats['rate_limited']} rate limited, {server_stats['errors']} errors")
+    print(f"  client limiter: {limiter['rate_limited']} rate limited, {limiter['throttled_seconds']:.1f}s waiting, final rate {limiter['rate']:.2f}/s")
@@ -0,0 +1,68 @@
+"""
+Memory benchmark: average memory used by one enriched streaming entry
+(SpotifyStreamingEntry + metadata + SPOTIFY_SEARCH_RESULTS_LIMIT tracks with scores), by one YTM processed track
+and by one converted (not yet enriched) row of a SpotifyStreamingTable.
+
+Run from the repository root: python -m benchmarks.entries_memory [--entries N] [--tracks N]
+"""
+import argparse
+import tracemalloc
+
+from objects.score_metadata import MatchScore
+from objects.ytm_processed_track import YTMProcessedTrack
+from spotify.spotify_listening_history import SpotifyAdditionalYTMData, SpotifyStreamingEntry
+from spotify.spotify_responses import TrackInfo
+from spotify.spotify_streaming_table import SpotifyStreamingTable
+
+
+def build_ytm_track(i: int) -> YTMProcessedTrack:
+    track = YTMProcessedTrack(timestamp_iso=f"2024-01-01T00:00:{i % 60:02d}.000Z", timestamp_unix=1704067200 + i,
+                              title=f"Track {i}", artist=f"Artist {i % 300}")
+    track.metadata.ytm_url = f"https://music.youtube.com/watch?v={i:011d}"
+    return track
+
+
+def build_spotify_entry(i: int, tracks_per_entry: int, additional_data: SpotifyAdditionalYTMData) -> SpotifyStreamingEntry:
+    entry = SpotifyStreamingEntry.from_ytm_track(build_ytm_track(i), additional_data)
+    entry.metadata.tracks = [
+        TrackInfo(id=f"{i:016d}{j:06d}", name=f"Track {i}", album_name=f"Album {i % 1000}", duration_ms=180000,
+                  artist_name=f"Artist {i % 300}", match_score=MatchScore(90.0, 90.0, 90.0, 90.0, 90.0, 90.0, 90.0))
+        for j in range(tracks_per_entry)
+    ]
+    return entry
+
+
+def build_table(count: int, additional_data: SpotifyAdditionalYTMData) -> SpotifyStreamingTable:
+    # a real history repeats the same tracks a lot: 1 distinct track for every 20 plays
+    return SpotifyStreamingTable.from_ytm_tracks((build_ytm_track(i % max(count // 20, 1)) for i in range(count)), additional_data)
+
+
+def measure(build, count: int) -> float:
+    """
+    Average bytes allocated per built object (objects are kept alive until measured)
+    """
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    objects = [build(i) for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del objects
+    return used / count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the memory used per history entry")
+    parser.add_argument("--entries", type=int, default=50000, help="Number of entries to build (default: 50000)")
+    parser.add_argument("--tracks", type=int, default=5, help="Spotify search results per entry (default: 5)")
+    args = parser.parse_args()
+
+    additional_data = SpotifyAdditionalYTMData(180000, "US", "ios", "127.0.0.1")
+
+    print(f"YTMProcessedTrack: {measure(build_ytm_track, args.entries):.0f} bytes / entry")
+    print(f"SpotifyStreamingEntry ({args.tracks} tracks): {measure(lambda i: build_spotify_entry(i, args.tracks, additional_data), args.entries):.0f} bytes / entry")
+
+    tracemalloc.start()
+    table = build_table(args.entries, additional_data)
+    print(f"SpotifyStreamingTable (converted rows): {tracemalloc.get_traced_memory()[0] / args.entries:.0f} bytes / entry")
+    tracemalloc.stop()
+    print(f"SpotifyStreamingEntry (converted, list): {measure(lambda i: SpotifyStreamingEntry.from_ytm_track(build_ytm_track(i % max(args.entries // 20, 1)), additional_data), args.entries):.0f} bytes / entry")
@@ -0,0 +1,290 @@
+"""
+Local stand-in for the Spotify Web API (client credentials token, track / artist search, artist albums, albums and
+album tracks), for offline enrichment tests and benchmarks: serves a fixture catalog and injects latency,
+rate limiting (429 + Retry-After) and server errors (5xx).
+
+Run from the repository root: python -m benchmarks.spotify_api_server [--catalog catalog.json | --generate N] [--port 8765] ...
+then point the scripts at it in .env:
+    SPOTIFY_API_URL=http://127.0.0.1:8765/v1/
+    SPOTIFY_AUTH_URL=http://127.0.0.1:8765/api/token
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import parse_qs, urlparse
+
+FIELD_QUERY_PATTERN = re.compile(r'(track|artist):"([^"]*)"')
+
+
+def generate_catalog(count: int, seed: int = 0) -> List[dict]:
+    """
+    Synthetic catalog: count tracks over count / 10 artists, in Spotify's track object shape
+    """
+    rng = random.Random(seed)
+    artists = max(count // 10, 1)
+    return [{
+        "id": f"{i:022d}",
+        "name": f"Track {i}",
+        "artists": [{"name": f"Artist {i % artists}"}],
+        # albums of 12 tracks, each by a single artist
+        "album": {"name": f"Album {i % artists}-{i // (artists * 12)}"},
+        "duration_ms": rng.randint(120000, 360000)
+    } for i in range(count)]
+
+
+class LocalSpotifyApi:
+    """
+    Catalog search + fault injection. Thread-safe: the HTTP server handles every request in its own thread
+    """
+    def __init__(self, catalog: List[dict], latency_ms: float = 0.0, latency_jitter_ms: float = 0.0,
+                 max_requests_per_second: Optional[float] = None, retry_after: int = 1, error_ratio: float = 0.0, seed: int = 0):
+        self.catalog = catalog
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.max_requests_per_second = max_requests_per_second
+        self.retry_after = retry_after
+        self.error_ratio = error_ratio
+
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.recent_requests = deque()
+        self.blocked_until = 0.0
+
+        # counters
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+
+        # lowercase search fields of every track
+        self.index = [(track["name"].lower(), ", ".join(artist["name"] for artist in track["artists"]).lower(), track) for track in catalog]
+
+        # artists and albums (ids derived from the names when the catalog has none), albums listed under their first artist
+        self.artists = {}
+        self.albums = {}
+        self.artist_albums = {}
+        for track in catalog:
+            for artist in track["artists"]:
+                artist.setdefault("id", self.get_id("artist", artist["name"]))
+                self.artists.setdefault(artist["id"], {"id": artist["id"], "name": artist["name"]})
+            track["album"].setdefault("id", self.get_id("album", track["album"]["name"]))
+            album = self.albums.setdefault(track["album"]["id"], dict(track["album"], tracks=[]))
+            album["tracks"].append(track)
+            if len(album["tracks"]) == 1 and track["artists"]:
+                self.artist_albums.setdefault(track["artists"][0]["id"], []).append(album)
+
+    def check_faults(self) -> Optional[tuple]:
+        """
+        (status, headers) of an injected failure for the current request, None to answer normally.
+        Rate limiting: more than max_requests_per_second in the last second blocks everybody for retry_after seconds
+        (the 429 answers tell the remaining time)
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.requests += 1
+
+            if self.max_requests_per_second:
+                while self.recent_requests and now - self.recent_requests[0] > 1.0:
+                    self.recent_requests.popleft()
+                if now >= self.blocked_until and len(self.recent_requests) >= self.max_requests_per_second:
+                    self.blocked_until = now + self.retry_after
+                if now < self.blocked_until:
+                    self.rate_limited += 1
+                    return 429, {"Retry-After": str(math.ceil(self.blocked_until - now))}
+                self.recent_requests.append(now)
+
+            if self.error_ratio and self.random.random() < self.error_ratio:
+                self.errors += 1
+                return self.random.choice((500, 502, 503)), {}
+
+            delay = (self.latency_ms + self.random.uniform(0, self.latency_jitter_ms)) / 1000
+
+        if delay > 0:
+            time.sleep(delay)
+        return None
+
+    @staticmethod
+    def get_id(kind: str, name: str) -> str:
+        return f"{kind[:2]}{hashlib.md5(name.encode('utf-8')).hexdigest()[:20]}"
+
+    def search_artists(self, query: str, limit: int) -> List[dict]:
+        fields = dict((field, value.lower()) for field, value in FIELD_QUERY_PATTERN.findall(query))
+        name = fields.get("artist", query.lower())
+        return [artist for artist in self.artists.values() if name in artist["name"].lower()][:limit]
+
+    def get_albums(self, artist_id: str) -> List[dict]:
+        return self.artist_albums.get(artist_id, [])
+
+    def get_album(self, album_id: str) -> Optional[dict]:
+        return self.albums.get(album_id)
+
+    def search(self, query: str, limit: int) -> List[dict]:
+        """
+        track:"..." artist:"..." queries match the fields exactly (case insensitive),
+        free text queries match the tracks having all the words in their name / artists
+        """
+        fields = dict((field, value.lower()) for field, value in FIELD_QUERY_PATTERN.findall(query))
+        if fields:
+            matches = (track for name, artists, track in self.index
+                       if name == fields.get("track", name) and fields.get("artist", "") in artists)
+        else:
+            words = query.lower().split()
+            matches = (track for name, artists, track in self.index if all(word in f"{name} {artists}" for word in words))
+
+        items = []
+        for track in matches:
+            items.append(track)
+            if len(items) >= limit:
+                break
+        return items
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {"requests": self.requests, "rate_limited": self.rate_limited, "errors": self.errors}
+
+
+class LocalSpotifyApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def api(self) -> LocalSpotifyApi:
+        return self.server.api
+
+    def send_json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        # client credentials flow: any client id / secret is accepted
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if urlparse(self.path).path != "/api/token":
+            self.send_json(404, {"error": "not_found"})
+            return
+        self.send_json(200, {"access_token": "local-token", "token_type": "Bearer", "expires_in": 3600})
+
+    def make_page(self, items: List[dict], limit: int, offset: int) -> dict:
+        page = items[offset:offset + limit]
+        has_next = offset + limit < len(items)
+        return {"href": self.path, "items": page, "limit": limit, "offset": offset, "total": len(items),
+                "next": f"{self.path}&next" if has_next else None, "previous": None}
+
+    @staticmethod
+    def simplify_album(album: dict) -> dict:
+        return {"id": album["id"], "name": album["name"], "total_tracks": len(album["tracks"])}
+
+    @staticmethod
+    def simplify_track(track: dict) -> dict:
+        return {key: value for key, value in track.items() if key != "album"}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        route = url.path.rstrip("/").split("/")[1:]
+        if route[:1] != ["v1"] or len(route) < 2 or route[1] not in ("search", "artists", "albums"):
+            self.send_json(404, {"error": {"status": 404, "message": "Service not found"}})
+            return
+
+        fault = self.api.check_faults()
+        if fault:
+            status, headers = fault
+            self.send_json(status, {"error": {"status": status, "message": "Injected failure"}}, headers)
+            return
+
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        limit = int(params.get("limit", 20))
+        offset = int(params.get("offset", 0))
+
+        if route[1] == "search":
+            if params.get("type") not in ("track", "artist") or "q" not in params:
+                self.send_json(400, {"error": {"status": 400, "message": "Only type=track / artist searches with a q parameter are supported"}})
+                return
+            if params["type"] == "artist":
+                items = self.api.search_artists(params["q"], limit)
+                self.send_json(200, {"artists": {"href": self.path, "items": items, "limit": limit, "offset": 0, "total": len(items),
+                                                 "next": None, "previous": None}})
+                return
+            items = self.api.search(params["q"], limit)
+            self.send_json(200, {"tracks": {"href": self.path, "items": items, "limit": limit, "offset": 0, "total": len(items),
+                                            "next": None, "previous": None}})
+
+        elif route[1] == "artists" and len(route) == 4 and route[3] == "albums":
+            albums = [self.simplify_album(album) for album in self.api.get_albums(route[2])]
+            self.send_json(200, self.make_page(albums, limit, offset))
+
+        elif route[1] == "albums" and len(route) == 2 and "ids" in params:
+            albums = []
+            for album_id in params["ids"].split(",")[:20]:
+                album = self.api.get_album(album_id)
+                if album:
+                    tracks = [self.simplify_track(track) for track in album["tracks"]]
+                    album = dict(self.simplify_album(album), tracks=self.make_page(tracks, 50, 0))
+                albums.append(album)
+            self.send_json(200, {"albums": albums})
+
+        elif route[1] == "albums" and len(route) == 4 and route[3] == "tracks" and self.api.get_album(route[2]):
+            tracks = [self.simplify_track(track) for track in self.api.get_album(route[2])["tracks"]]
+            self.send_json(200, self.make_page(tracks, min(limit, 50), offset))
+
+        else:
+            self.send_json(404, {"error": {"status": 404, "message": "Non existing id"}})
+
+    def log_message(self, format, *args):
+        pass # one line per request would flood the benchmarks
+
+
+def start_server(api: LocalSpotifyApi, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """
+    Serve the API from a background thread (port 0: any free port, see server.server_address)
+    """
+    server = ThreadingHTTPServer((host, port), LocalSpotifyApiHandler)
+    server.daemon_threads = True
+    server.api = api
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Spotify Web API stand-in (token + track search) with latency / failure injection")
+    parser.add_argument("--catalog", help="JSON file with an array of Spotify track objects (id, name, artists, album, duration_ms)")
+    parser.add_argument("--generate", type=int, default=10000, help="Size of the generated catalog, when no --catalog is given (default: 10000)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Response latency (default: 50)")
+    parser.add_argument("--latency-jitter-ms", type=float, default=20.0, help="Random extra latency (default: 20)")
+    parser.add_argument("--max-requests-per-second", type=float, help="Answer 429 above this request rate (default: no rate limiting)")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After of the 429 answers, in seconds (default: 1)")
+    parser.add_argument("--error-ratio", type=float, default=0.0, help="Ratio of searches answered with a 5xx error (default: 0)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.catalog:
+        with open(args.catalog, 'r', encoding='utf-8') as file:
+            catalog = json.load(file)
+    else:
+        catalog = generate_catalog(args.generate, args.seed)
+
+    api = LocalSpotifyApi(catalog, args.latency_ms, args.latency_jitter_ms, args.max_requests_per_second, args.retry_after, args.error_ratio, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), LocalSpotifyApiHandler)
+    server.daemon_threads = True
+    server.api = api
+
+    print(f"Serving {len(catalog)} tracks on http://{args.host}:{args.port} (Ctrl+C to stop)")
+    print(f"  SPOTIFY_API_URL=http://{args.host}:{args.port}/v1/")
+    print(f"  SPOTIFY_AUTH_URL=http://{args.host}:{args.port}/api/token")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Stats: {api.get_stats()}")
@@ -5,11 +5,28 @@ Executes the full workflow: sanitize -> convert -> enrich -> report
 """
 
 import argparse
+import shlex
 import subprocess
 import sys
 import os
 from pathlib import Path
+from dotenv import load_dotenv
+from utils.file_utils import get_delta_name, get_export_extension
 from utils.simple_logger import print_log
+from utils.stage_manifest import get_code_files, is_stage_up_to_date, write_stage_manifest
+
+# Scripts of each automatic stage; the stage manifest (see --skip-unchanged) hashes them with all the modules they import
+SCRIPTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SANITIZE_SCRIPTS = ["sanitizer.py"]
+CONVERT_SCRIPTS = ["converter.py"]
+ENRICH_SCRIPTS = ["enricher.py", "matcher.py"]
+
+
+def quote_path(path: str) -> str:
+    """
+    File path as a single argument of a shell command (paths with spaces)
+    """
+    return subprocess.list2cmdline([path]) if os.name == "nt" else shlex.quote(path)
 
 
 def run_command(command: str, description: str, is_fatal: bool = True) -> bool:
@@ -36,6 +53,40 @@ def run_command(command: str, description: str, is_fatal: bool = True) -> bool:
         return False
 
 
+def run_in_process(step, description: str, is_fatal: bool = True) -> bool:
+    """
+    Run a pipeline step in the current process and return success status
+    """
+    print_log(f"Running (in-process): {description}")
+
+    try:
+        step()
+        print_log(f"✓ Success: {description}")
+        return True
+    except Exception as e:
+        print_log(f"✗ Failed: {description}")
+        print_log(f"Error: {e}")
+        if is_fatal:
+            print_log("Fatal error occurred. Exiting...")
+            sys.exit(1)
+        return False
+
+
+def run_stage(stage: str, input_file: str, output_files: list, settings: dict, code_files: list, run, skip_unchanged: bool = False) -> bool:
+    """
+    Run a stage and record its manifest; with skip_unchanged, the stage is skipped if its input file contents,
+    settings and code are the same as in the last run and its outputs were not touched since.
+    Returns True if the stage was run
+    """
+    if skip_unchanged and is_stage_up_to_date(stage, input_file, settings, code_files):
+        print_log(f"✓ Up to date (input, settings and code unchanged), skipping: {stage} for {input_file}")
+        return False
+
+    run()
+    write_stage_manifest(stage, input_file, settings, code_files, output_files)
+    return True
+
+
 def check_file_exists(filepath: str) -> bool:
     """
     Check if a file exists and log the result
@@ -55,7 +106,7 @@ def print_title(text):
 
 def main():
     parser = argparse.ArgumentParser(description="All-in-one YouTube Music to Spotify converter pipeline")
-    parser.add_argument("--file", required=True, help="Input JSON file with YouTube Music watch history")
+    parser.add_argument("--file", required=True, nargs="+", help="Input JSON file(s) with YouTube Music watch history (multiple files are merged first, without duplicates)")
     parser.add_argument("--skip-sanitize", action="store_true", help="Skip sanitization step (if already done)")
     parser.add_argument("--skip-sanitize-export", action="store_true", help="Skip sanitization - videos CSV generation step (if you already exported it)")
     parser.add_argument("--skip-convert", action="store_true", help="Skip conversion steps (if already done)")
@@ -66,20 +117,63 @@ def main():
     parser.add_argument("--skip-videos-report-export", action="store_true", help="Skip matched track analysis export (CSV report generation) for videos (if you already exported it)")
     parser.add_argument("--ignore-videos", action="store_true", help="Specify in order to ignore videos watched on YouTube Music and process only songs")
     parser.add_argument("--use-pause", action="store_true", help="Specify in order to pause between each step")
+    parser.add_argument("--in-process", action="store_true", help="Specify in order to run the automatic steps (sanitize, convert, enrich) in this process, passing data in memory and sharing one Spotify client")
+    parser.add_argument("--skip-unchanged", action="store_true", help="Specify in order to skip the automatic steps whose input file, settings and code did not change since their last run")
+    parser.add_argument("--since-last-run", action="store_true", help="Specify in order to sanitize (and then convert / enrich) only the entries newer than the last --since-last-run execution")
+    parser.add_argument("--resume-enrich", action="store_true", help="Specify in order to continue an interrupted enrichment step from its journal instead of starting it over")
+    parser.add_argument("--spotify-export", action="store_true", help="Specify in order to export all the successfully converted files (output\\ok, previous runs included) as Spotify-like Streaming_History_Audio_*.json files at the end")
     
     args = parser.parse_args()
     
-    input_file = args.file
-    base_name = Path(input_file).stem  # e.g., "watch-history"
+    input_files = args.file
 
     print_title("YouTube Music to Spotify Converter - All-in-One Pipeline")
-    print_log(f"Input file: {input_file}")
+    print_log(f"Input file(s): {' '.join(input_files)}")
     
-    # Check if input file exists
-    if not check_file_exists(input_file):
+    # Check if input files exist
+    if not all([check_file_exists(f) for f in input_files]):
         print_log("Input file not found. Exiting.")
         sys.exit(1)
 
+    # Step 0: Merge multiple exports into a single history
+    input_file = input_files[0]
+    if len(input_files) > 1:
+        input_file = f"output\\{Path(input_files[0]).stem}.merged.json"
+
+        if args.skip_sanitize:
+            print_log("Skipping merge step...")
+        else:
+            print_title("STEP 0: Merge watch history files")
+            cmd = f"python merger.py --files {' '.join(map(quote_path, input_files))} --output {quote_path(input_file)}"
+            run_command(cmd, "Merging watch history files")
+
+    base_name = Path(input_file).stem  # e.g., "watch-history"
+
+    # Incremental run: the delta is written to its own files (e.g. "watch-history.delta-20250101-120000"),
+    # the outputs of the previous runs are kept
+    if args.since_last_run:
+        if args.skip_sanitize:
+            parser.error("--since-last-run cannot be used with --skip-sanitize (the delta is produced by the sanitization)")
+        base_name = get_delta_name(input_file)
+
+    # Settings each automatic stage depends on (the scripts read them from the same .env file)
+    load_dotenv()
+    sanitize_settings = {"ignore_videos": args.ignore_videos, "since_last_run": args.since_last_run, "INTERMEDIATE_FORMAT": os.getenv("INTERMEDIATE_FORMAT")}
+    convert_settings = {key: os.getenv(key) for key in ["MS_PLAYED", "CONN_COUNTRY", "PLATFORM", "IP_ADDR", "INTERMEDIATE_FORMAT"]}
+    enrich_settings = {key: os.getenv(key) for key in ["CONN_COUNTRY", "SPOTIFY_SEARCH_RESULTS_LIMIT", "SPOTIFY_ARTIST_PREFETCH_MIN_TRACKS", "LOCAL_CATALOG_SOURCES", "TITLE_CLUSTERING", "SCORE_TRACKS_BY", "MINIMUM_MATCH_DECISION_SCORE", "INTERMEDIATE_FORMAT"]}
+
+    # In-process runner (imported only when used: it loads the Spotify / fuzzy matching dependencies)
+    pipeline = None
+    if args.in_process:
+        from pipeline import Pipeline
+        pipeline = Pipeline()
+
+    # Code each automatic stage depends on (the in-process runner runs the stages through pipeline.py)
+    runner_scripts = ["pipeline.py"] if pipeline else []
+    sanitize_code_files = get_code_files(SANITIZE_SCRIPTS + runner_scripts, SCRIPTS_DIRECTORY)
+    convert_code_files = get_code_files(CONVERT_SCRIPTS + runner_scripts, SCRIPTS_DIRECTORY)
+    enrich_code_files = get_code_files(ENRICH_SCRIPTS + runner_scripts, SCRIPTS_DIRECTORY)
+
     # Store generated error files    
     error_files = []
 
@@ -88,19 +182,32 @@ def main():
 
     # Step 1: Sanitize and split input
 
+    # Extension of the intermediate files (INTERMEDIATE_FORMAT), the others are always .json
+    intermediate_extension = get_export_extension(intermediate=True)
+
     # Define sanitizer output files
-    sanitized_songs = f"output\\{base_name}.songs.json"
+    sanitized_songs = f"output\\{base_name}.songs{intermediate_extension}"
     sanitized_videos = f"output\\{base_name}.videos.json"
-    sanitized_validated_videos = f"output\\{base_name}.videos.reviewed.json"
+    sanitized_validated_videos = f"output\\{base_name}.videos.reviewed{intermediate_extension}"
     sanitized_errors = f"output\\errors\\{base_name}.errors.json"
+    sanitized_skipped = f"output\\{base_name}.skipped.json"
     
 
     if args.skip_sanitize:
         print_log("Skipping sanitization step...")
     else:
         print_title("STEP 1: Sanitize and split input")
-        cmd = f"python sanitizer.py --file {input_file}" + (args.ignore_videos and " --ignore-videos" or "")
-        run_command(cmd, "Sanitizing and splitting input data")
+        cmd = f"python sanitizer.py --file {quote_path(input_file)}" + (args.ignore_videos and " --ignore-videos" or "")
+        if args.since_last_run:
+            cmd += f" --since-last-run --delta-name {quote_path(base_name)}"
+        def sanitize():
+            if pipeline and not args.since_last_run:
+                run_in_process(lambda: pipeline.sanitize(input_file, args.ignore_videos), "Sanitizing and splitting input data")
+            else:
+                run_command(cmd, "Sanitizing and splitting input data")
+
+        run_stage("sanitize", input_file, [sanitized_songs, sanitized_videos, sanitized_errors, sanitized_skipped],
+                  sanitize_settings, sanitize_code_files, sanitize, args.skip_unchanged)
 
         # Print error files if created
         if check_file_exists(sanitized_errors):
@@ -111,7 +218,7 @@ def main():
         if has_videos:
             # Step 3: Manual Review of Videos File
             print_title("STEP 3: Manual Review of Videos File")
-            cmd = f"python reporter-videos.py --file {sanitized_videos} --import"
+            cmd = f"python reporter-videos.py --file {quote_path(sanitized_videos)} --import"
             if not args.skip_sanitize_export:
                 cmd += " --export"
             
@@ -123,9 +230,9 @@ def main():
     # Step 2 + 3 + 4: Conversion
 
     # Define converter output files
-    spotified_songs = f"output\\{base_name}.songs.spotify.json"
+    spotified_songs = f"output\\{base_name}.songs.spotify{intermediate_extension}"
     # Define expected output files
-    spotified_videos = f"output\\{base_name}.videos.reviewed.spotify.json"
+    spotified_videos = f"output\\{base_name}.videos.reviewed.spotify{intermediate_extension}"
     
     if args.skip_convert:
         print_log("Skipping conversion step...")
@@ -134,15 +241,19 @@ def main():
         has_songs = check_file_exists(sanitized_songs)
         if has_songs:
             print_title("STEP 2: Convert songs to Spotify format")
-            cmd = f"python converter.py --file {sanitized_songs}"
-            run_command(cmd, "Converting songs to Spotify format")
+            cmd = f"python converter.py --file {quote_path(sanitized_songs)}"
+            run_stage("convert", sanitized_songs, [spotified_songs], convert_settings, convert_code_files,
+                      lambda: run_in_process(lambda: pipeline.convert(sanitized_songs), "Converting songs to Spotify format") if pipeline else run_command(cmd, "Converting songs to Spotify format"),
+                      args.skip_unchanged)
         
         has_videos = check_file_exists(sanitized_validated_videos)
         if has_videos:
             # Step 4 - Videos processing
             print_title("STEP 4: Convert music videos to Spotify format")
-            cmd = f"python converter.py --file {sanitized_validated_videos}"
-            run_command(cmd, "Converting music videos to Spotify format")
+            cmd = f"python converter.py --file {quote_path(sanitized_validated_videos)}"
+            run_stage("convert", sanitized_validated_videos, [spotified_videos], convert_settings, convert_code_files,
+                      lambda: run_in_process(lambda: pipeline.convert(sanitized_validated_videos), "Converting music videos to Spotify format") if pipeline else run_command(cmd, "Converting music videos to Spotify format"),
+                      args.skip_unchanged)
         else:
             print_log("Skipping steps 3 and 4 (videos) since either --ignore-videos is enabled or no videos have been found")
 
@@ -163,13 +274,16 @@ def main():
         print_log("Skipping enrichment step...")
     else:
         print_title("STEP 5: Enrich with Spotify track data")
+        resume_option = " --resume" if args.resume_enrich else ""
 
         if not args.skip_songs_enrich:
             # Enrich songs
             has_songs = check_file_exists(spotified_songs)
             if has_songs:
-                cmd = f"python enricher.py --file {spotified_songs}"
-                run_command(cmd, "Enriching songs with Spotify data")
+                cmd = f"python enricher.py --file {quote_path(spotified_songs)}{resume_option}"
+                run_stage("enrich", spotified_songs, [enriched_songs_ok, enriched_songs_doubt, enriched_songs_errors], enrich_settings, enrich_code_files,
+                          lambda: run_in_process(lambda: pipeline.enrich(spotified_songs, args.resume_enrich), "Enriching songs with Spotify data") if pipeline else run_command(cmd, "Enriching songs with Spotify data"),
+                          args.skip_unchanged)
 
                 if check_file_exists(enriched_songs_ok):
                     ok_files.append(enriched_songs_ok)
@@ -180,8 +294,10 @@ def main():
         # Enrich videos
         has_videos = check_file_exists(spotified_videos)
         if has_videos:
-            cmd = f"python enricher.py --file {spotified_videos}"
-            run_command(cmd, "Enriching videos with Spotify data")
+            cmd = f"python enricher.py --file {quote_path(spotified_videos)}{resume_option}"
+            run_stage("enrich", spotified_videos, [enriched_videos_ok, enriched_videos_doubt, enriched_videos_errors], enrich_settings, enrich_code_files,
+                      lambda: run_in_process(lambda: pipeline.enrich(spotified_videos, args.resume_enrich), "Enriching videos with Spotify data") if pipeline else run_command(cmd, "Enriching videos with Spotify data"),
+                      args.skip_unchanged)
 
             if check_file_exists(enriched_videos_ok):
                 ok_files.append(enriched_videos_ok)
@@ -208,7 +324,7 @@ def main():
         # Report for songs
         has_songs = check_file_exists(enriched_songs_doubt)
         if has_songs:
-            cmd = f"python reporter.py --file {enriched_songs_doubt} --import"
+            cmd = f"python reporter.py --file {quote_path(enriched_songs_doubt)} --import"
             if not args.skip_songs_report_export:
                 cmd += " --export"
             
@@ -223,7 +339,7 @@ def main():
         # Report for videos
         has_videos = check_file_exists(enriched_videos_doubt)
         if has_videos:
-            cmd = f"python reporter.py --file {enriched_videos_doubt} --import"
+            cmd = f"python reporter.py --file {quote_path(enriched_videos_doubt)} --import"
             if not args.skip_videos_report_export:
                 cmd += " --export"
             
@@ -237,6 +353,14 @@ def main():
 
     print_title("Pipeline execution complete!")
 
+    # Incremental run: the next one starts after this delta only now that it went through the whole pipeline
+    if args.since_last_run:
+        commit_cmd = f"python sanitizer.py --file {quote_path(input_file)} --commit-watermark"
+        if args.skip_convert or args.skip_enrich or args.skip_songs_enrich:
+            print_log(f"Watermark not committed since some steps were skipped; once the delta is converted and enriched, run: {commit_cmd}")
+        else:
+            run_command(commit_cmd, "Committing the --since-last-run watermark")
+
     # Print the success files:
     if len(ok_files) > 0:
         print_log("You can use the following successfully converted files:")
@@ -244,6 +368,13 @@ def main():
             print_log(f" ✓ {f}")
     else:
         print_log("No successfully converted files found.")
+
+    # Spotify-like export of all the successfully converted files, of this run and of the previous ones
+    # (an incremental run only converts the new entries)
+    if args.spotify_export:
+        print_title("STEP 7: Export Spotify-like streaming history files")
+        cmd = "python exporter.py"
+        run_command(cmd, "Exporting Spotify-like streaming history files (all the files in output\\ok)", is_fatal=False)
     
     # Print the error files:
     if len(error_files) > 0:
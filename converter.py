@@ -1,36 +1,44 @@
 import json
 import argparse
 import os
-from typing import List
+from typing import Iterable
 from dotenv import load_dotenv
-from spotify.spotify_listening_history import SpotifyAdditionalYTMData, SpotifyStreamingEntry
+from spotify.spotify_listening_history import SpotifyAdditionalYTMData
+from spotify.spotify_streaming_table import SpotifyStreamingTable
 from objects.ytm_processed_track import YTMProcessedTrack
+from utils.entry_files import iter_entries
 from utils.file_utils import export_to_json
 from utils.simple_logger import print_log
 
-def convert_ytm_to_spotify_format(input_file: str) -> List[SpotifyStreamingEntry]:
+def read_additional_data_from_env() -> SpotifyAdditionalYTMData:
+    """
+    Load the Spotify fields that do not exist in YTM history from the environment
+    """
+    additional_data = SpotifyAdditionalYTMData()
+    additional_data.ms_played = int(os.getenv('MS_PLAYED'))
+    additional_data.conn_country = os.getenv('CONN_COUNTRY')
+    additional_data.platform = os.getenv('PLATFORM')
+    additional_data.ip_addr = os.getenv('IP_ADDR')
+    return additional_data
+
+def convert_ytm_tracks(ytm_tracks: Iterable[YTMProcessedTrack], additional_data: SpotifyAdditionalYTMData) -> SpotifyStreamingTable:
+    """
+    Convert YTM processed tracks to Spotify streaming format, in a columnar table (see SpotifyStreamingTable)
+    """
+    return SpotifyStreamingTable.from_ytm_tracks(ytm_tracks, additional_data)
+
+def convert_ytm_to_spotify_format(input_file: str) -> SpotifyStreamingTable:
     """
     Read YTM processed tracks from JSON file and convert to Spotify streaming format
     """
     try:
-        with open(input_file, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-            ytm_tracks = [YTMProcessedTrack.from_dict(item) for item in data]
+        ytm_tracks = (YTMProcessedTrack.from_dict(item) for item in iter_entries(input_file))
 
         # load additional data from environment
-        additional_data = SpotifyAdditionalYTMData()
-        additional_data.ms_played = int(os.getenv('MS_PLAYED'))
-        additional_data.conn_country = os.getenv('CONN_COUNTRY')
-        additional_data.platform = os.getenv('PLATFORM')
-        additional_data.ip_addr = os.getenv('IP_ADDR')
+        additional_data = read_additional_data_from_env()
 
         # Convert to Spotify format
-        spotify_entries = []
-        for ytm_track in ytm_tracks:
-            spotify_entry = SpotifyStreamingEntry.from_ytm_track(ytm_track, additional_data)
-            spotify_entries.append(spotify_entry)
-        
-        return spotify_entries
+        return convert_ytm_tracks(ytm_tracks, additional_data)
     
     except FileNotFoundError:
         print_log(f"Error: {input_file} not found")
@@ -57,7 +65,7 @@ if __name__ == "__main__":
     
     if spotify_entries:
         print_log(f"Successfully converted {len(spotify_entries)} YTM tracks to Spotify format")
-        export_to_json(spotify_entries, input_file, "spotify")
+        export_to_json(spotify_entries, input_file, "spotify", intermediate=True)
         print_log("Conversion complete")
     else:
         print_log("No tracks converted or error occurred")
@@ -1,28 +1,44 @@
 import argparse
 import json
 import os
-from typing import List
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
 from matcher import score_spotify_entries
+from objects.enrichment_journal import RESULT_ERROR, RESULT_PROCESSED, EnrichmentJournal
 from objects.process_metadata import ProcessingStatus
 from objects.spotify_processed_track import SpotifyProcessedTracks
-from spotify.constants import SPOTIFY_SHADY_PARTS
-from spotify.spotify_client import SpotifyClient
+from spotify.constants import (DEFAULT_BASE_BACKOFF_SECONDS, DEFAULT_MIN_REQUESTS_PER_SECOND, DEFAULT_RATE_LIMIT_COOLDOWN_SECONDS,
+                               DEFAULT_REQUESTS_BURST, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_SEARCH_CACHE_FILE, DEFAULT_SEARCH_CACHE_MAX_MB,
+                               DEFAULT_SEARCH_CACHE_NOT_FOUND_TTL_DAYS, DEFAULT_SEARCH_CACHE_TTL_DAYS, DEFERRED_RETRY_PAUSE_SECONDS,
+                               DEFERRED_RETRY_ROUNDS)
+from spotify.artist_catalog import ArtistCatalog
+from spotify.local_catalog import LocalCatalog
+from spotify.query_normalization import normalize_search_terms
+from spotify.search_cache import SpotifySearchCache
+from spotify.spotify_client import SearchError, SpotifyClient, TransientSearchError
 from spotify.spotify_listening_history import SpotifyStreamingEntry
+from spotify.spotify_streaming_table import SpotifyStreamingTable
+from spotify.title_clustering import cluster_search_terms, get_search_aliases
+from utils.api_cassette import CASSETTE_REPLAY_REQUESTS_PER_SECOND, create_api_cassette_from_env
+from utils.entry_files import iter_entries
 from utils.file_utils import export_to_json
+from utils.rate_limiter import RateLimiter
 from utils.simple_logger import print_log
 from ytm.constants import YTM_INVALID_ARTIST
 
+# Result of an entry whose search failed temporarily (retried at the end of the enrichment, never journaled)
+RESULT_DEFERRED = "deferred"
 
-def read_spotify_entries(input_file: str) -> List[SpotifyStreamingEntry]:
+
+def read_spotify_entries(input_file: str) -> SpotifyStreamingTable:
     """
-    Read Spotify streaming entries from JSON file
+    Read Spotify streaming entries from JSON file, into a columnar table (see SpotifyStreamingTable)
     """
     try:
-        with open(input_file, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-            entries = [SpotifyStreamingEntry.from_dict(item) for item in data]
+        entries = SpotifyStreamingTable.from_entries(SpotifyStreamingEntry.from_dict(item) for item in iter_entries(input_file))
         
         return entries
     
@@ -37,28 +53,243 @@ def read_spotify_entries(input_file: str) -> List[SpotifyStreamingEntry]:
         return []
 
 
-def enrich_spotify_entries(entries: List[SpotifyStreamingEntry], spoticlient: SpotifyClient) -> SpotifyProcessedTracks:
+def get_search_terms(entry: SpotifyStreamingEntry, aliases: Optional[Dict[Tuple[str, str], Tuple[str, str]]] = None) -> Tuple[str, str]:
+    """
+    Normalized track and artist names to search (see spotify/query_normalization.py);
+    aliases: search to run instead (title clustering)
+    """
+    search_track_name, search_artist_name = normalize_search_terms(entry.master_metadata_track_name, entry.master_metadata_album_artist_name)
+    if search_artist_name == YTM_INVALID_ARTIST:
+        search_artist_name = ""
+
+    if aliases:
+        return aliases.get((search_track_name, search_artist_name), (search_track_name, search_artist_name))
+    return search_track_name, search_artist_name
+
+def log_query_normalization(entries: List[SpotifyStreamingEntry]):
+    """
+    Report how many searches the query normalization saves: distinct title / artist pairs as written in the history
+    vs distinct normalized searches
+    """
+    written = set()
+    searches = set()
+    for entry in entries:
+        if entry.has_spotify_data() or not entry.has_basic_info():
+            continue
+        written.add((entry.master_metadata_track_name, entry.master_metadata_album_artist_name))
+        searches.add(get_search_terms(entry))
+
+    if written:
+        print_log(f"Query normalization: {len(written)} distinct titles / artists -> {len(searches)} distinct searches "
+                  f"({len(written) - len(searches)} saved, {(len(written) - len(searches)) / len(written):.1%})")
+
+def submit_searches(entries: List[SpotifyStreamingEntry], spoticlient: SpotifyClient, executor: ThreadPoolExecutor,
+                    aliases: Optional[Dict[Tuple[str, str], Tuple[str, str]]] = None) -> Dict[Tuple[str, str], Future]:
+    """
+    Start the searches of all the entries that need one (each distinct search only once) on the executor threads
+    """
+    searches = {}
+    for entry in entries:
+        if entry.has_spotify_data() or not entry.has_basic_info():
+            continue
+
+        search_terms = get_search_terms(entry, aliases)
+        if search_terms not in searches:
+            searches[search_terms] = executor.submit(spoticlient.search_track, *search_terms)
+    return searches
+
+def get_searches_to_run(entries: List[SpotifyStreamingEntry], spoticlient: SpotifyClient,
+                        aliases: Optional[Dict[Tuple[str, str], Tuple[str, str]]] = None) -> List[Tuple[str, str]]:
+    """
+    Distinct search terms of the entries that need a search and are not cached yet
+    """
+    searches = {}
+    for entry in entries:
+        if entry.has_spotify_data() or not entry.has_basic_info():
+            continue
+
+        search_terms = get_search_terms(entry, aliases)
+        if search_terms not in searches:
+            searches[search_terms] = not spoticlient.is_search_cached(*search_terms)
+    return [search_terms for search_terms, to_run in searches.items() if to_run]
+
+def resolve_from_local_catalog(entries: List[SpotifyStreamingEntry], spoticlient: SpotifyClient, catalog: LocalCatalog,
+                               aliases: Optional[Dict[Tuple[str, str], Tuple[str, str]]] = None) -> int:
+    """
+    Resolve the searches having a high confidence match in the local catalog (no API calls); returns their number
+    """
+    searches = get_searches_to_run(entries, spoticlient, aliases)
+    resolved = 0
+    for track_name, artist_name in searches:
+        tracks = catalog.match(track_name, artist_name, spoticlient.search_results_limit)
+        if tracks:
+            # only kept for this run: the catalog is rebuilt from the outputs every time
+            spoticlient.remember_search(track_name, artist_name, tracks, persistent=False)
+            resolved += 1
+
+    print_log(f"Local catalog ({len(catalog.tracks)} tracks): {resolved}/{len(searches)} searches resolved without searching")
+    return resolved
+
+def prefetch_artist_catalogs(entries: List[SpotifyStreamingEntry], spoticlient: SpotifyClient, min_tracks: int,
+                             executor: Optional[ThreadPoolExecutor] = None,
+                             aliases: Optional[Dict[Tuple[str, str], Tuple[str, str]]] = None) -> int:
+    """
+    For the artists with at least min_tracks distinct (not cached) searches, get their whole catalog with a few API calls
+    and resolve these searches locally; the titles not found in it are searched as usual.
+    Returns the number of searches resolved
+    """
+    searches_by_artist: Dict[str, List[str]] = {}
+    for track_name, artist_name in get_searches_to_run(entries, spoticlient, aliases):
+        if artist_name:
+            searches_by_artist.setdefault(artist_name, []).append(track_name)
+
+    artists = [(artist_name, track_names) for artist_name, track_names in searches_by_artist.items() if len(track_names) >= min_tracks]
+
+    if not artists:
+        return 0
+
+    total_searches = sum(len(track_names) for _, track_names in artists)
+    print_log(f"Prefetching the catalogs of {len(artists)} artists with at least {min_tracks} distinct tracks ({total_searches} searches)")
+
+    def prefetch(artist_name: str, track_names: List[str]) -> int:
+        try:
+            catalog = ArtistCatalog(spoticlient.get_artist_catalog(artist_name))
+        except SearchError as e:
+            print_log(f"Could not get the catalog of '{artist_name}': {e} (its tracks will be searched)")
+            return 0
+
+        resolved = 0
+        for track_name in track_names:
+            tracks = catalog.match(track_name, spoticlient.search_results_limit)
+            if tracks:
+                # only kept for this run: a catalog match is not a search result, it must not stand in for one in the cache
+                spoticlient.remember_search(track_name, artist_name, tracks, persistent=False)
+                resolved += 1
+        print_log(f"Catalog of '{artist_name}': {len(catalog.tracks)} tracks, {resolved}/{len(track_names)} searched titles found")
+        return resolved
+
+    if executor:
+        resolved = sum(executor.map(lambda artist: prefetch(*artist), artists))
+    else:
+        resolved = sum(prefetch(*artist) for artist in artists)
+
+    print_log(f"Artist catalog prefetch: {resolved}/{total_searches} searches resolved without searching")
+    return resolved
+
+def enrich_spotify_entries(entries: List[SpotifyStreamingEntry], spoticlient: SpotifyClient, workers: int = 1,
+                           journal: Optional[EnrichmentJournal] = None, artist_prefetch_min_tracks: int = 0,
+                           local_catalog: Optional[LocalCatalog] = None,
+                           search_aliases: Optional[Dict[Tuple[str, str], Tuple[str, str]]] = None,
+                           deferred_retry_rounds: int = DEFERRED_RETRY_ROUNDS,
+                           deferred_retry_pause: float = DEFERRED_RETRY_PAUSE_SECONDS) -> SpotifyProcessedTracks:
     """
-    Enrich Spotify entries with metadata from Spotify API
+    Enrich Spotify entries with metadata from Spotify API.
+    With workers > 1 the searches run concurrently (the client rate limiting is shared by all of them);
+    the results are still processed / logged in input order.
+    With a journal, every result is appended to it as soon as it is known and the entries it already has are not searched again.
+    Searches failing temporarily are deferred and retried at the end, after all the other entries (deferred_retry_rounds
+    more times, deferred_retry_pause seconds apart while the client is still cooling down from rate limiting).
+    With a local_catalog, its high confidence matches are used without searching; then, with artist_prefetch_min_tracks,
+    the artists with that many distinct tracks left get their catalog prefetched.
+    search_aliases: search to run instead of a search (title clustering), its result is used for all of them
     """
     total_entries = len(entries)
-    output = SpotifyProcessedTracks(processed=[], doubt=[], errors=[])
+    journaled = set(journal.results) if journal else set()
+    results: Dict[int, str] = {}
+    deferred: List[int] = []
 
     print_log(f"Starting enrichment of {total_entries} entries...")
-    
-    for i, entry in enumerate(entries):
-
-        # Skip if already has Spotify track URI
-        if entry.has_spotify_data():
-            message = "Already has Spotify Data - skipping any API calls"
-            print_log(f"Entry {i+1}/{total_entries}: {message}")
-            entry.metadata.status = ProcessingStatus.SKIPPED
-            entry.metadata.status_message = message
-            output.processed.append(entry)
-            continue
+    if journaled:
+        print_log(f"Resuming from {journal.journal_file}: {len(journaled)} entries already enriched")
+
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        # the search planning only reads the entries (table rows are built on access, not kept)
+        pending_entries = [entries[i] for i in range(total_entries) if i not in journaled] if journaled else entries
+        log_query_normalization(pending_entries)
+        if local_catalog and local_catalog.tracks:
+            resolve_from_local_catalog(pending_entries, spoticlient, local_catalog, search_aliases)
+        if artist_prefetch_min_tracks > 0:
+            prefetch_artist_catalogs(pending_entries, spoticlient, artist_prefetch_min_tracks, executor, search_aliases)
+
+        searches = {}
+        if executor:
+            searches = submit_searches(pending_entries, spoticlient, executor, search_aliases)
+            print_log(f"Running {len(searches)} distinct searches with {workers} workers")
+
+        failed_searches = set()
+        for i, entry in enumerate(entries):
+            result, entry = enrich_spotify_entry(i, total_entries, entry, spoticlient, searches, journal, failed_searches=failed_searches,
+                                                 aliases=search_aliases)
+            if i in journaled:
+                entries[i] = entry # enriched by the resumed run, from its journal
+            if result == RESULT_DEFERRED:
+                deferred.append(i)
+            else:
+                results[i] = result
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+    # Deferred retry queue: a few more rounds, spaced out, for the searches that failed temporarily
+    for retry_round in range(1, deferred_retry_rounds + 1):
+        if not deferred:
+            break
+
+        # the pause only helps against rate limiting, server / network errors are retried right away
+        if spoticlient.rate_limiter.is_cooling_down():
+            print_log(f"Retrying {len(deferred)} deferred searches in {deferred_retry_pause} seconds (round {retry_round}/{deferred_retry_rounds})...")
+            time.sleep(deferred_retry_pause)
+        else:
+            print_log(f"Retrying {len(deferred)} deferred searches (round {retry_round}/{deferred_retry_rounds})...")
+
+        still_deferred = []
+        failed_searches = set()
+        for i in deferred:
+            result, entry = enrich_spotify_entry(i, total_entries, entries[i], spoticlient, {}, journal,
+                                                 defer_transient=retry_round < deferred_retry_rounds, failed_searches=failed_searches,
+                                                 aliases=search_aliases)
+            if result == RESULT_DEFERRED:
+                still_deferred.append(i)
+            else:
+                results[i] = result
+        deferred = still_deferred
+
+    # Outputs in input order (entries changed in place)
+    output = SpotifyProcessedTracks(processed=SpotifyStreamingTable(), doubt=SpotifyStreamingTable(), errors=SpotifyStreamingTable())
+    for i in sorted(results):
+        (output.processed if results[i] == RESULT_PROCESSED else output.errors).append(entries[i])
+
+    print_log(f"\nEnrichment complete:")
+    print_log(f"  Successfully enriched / have data: {len(output.processed)}")
+    print_log(f"  Failed to find: {len(output.errors)}")
 
+    return output
+
+def enrich_spotify_entry(i: int, total_entries: int, entry: SpotifyStreamingEntry, spoticlient: SpotifyClient,
+                         searches: Dict[Tuple[str, str], Future], journal: Optional[EnrichmentJournal] = None,
+                         defer_transient: bool = True, failed_searches: Optional[set] = None,
+                         aliases: Optional[Dict[Tuple[str, str], Tuple[str, str]]] = None) -> Tuple[str, SpotifyStreamingEntry]:
+    """
+    Enrich one entry (i: its index in the input); returns its result (processed / error, or deferred for temporary
+    search failures when defer_transient) and the entry. Final results are appended to the journal.
+    failed_searches: search terms that already failed temporarily in this pass (deferred without calling the API again);
+    aliases: search to run instead (title clustering)
+    """
+    if journal and i in journal.results:
+        return journal.results[i]
+
+    # Skip if already has Spotify track URI
+    if entry.has_spotify_data():
+        message = "Already has Spotify Data - skipping any API calls"
+        print_log(f"Entry {i+1}/{total_entries}: {message}")
+        entry.metadata.status = ProcessingStatus.SKIPPED
+        entry.metadata.status_message = message
+        result = RESULT_PROCESSED
+
+    else:
         try:
-            
+
             # Skip if missing required fields
             if not entry.has_basic_info():
                 raise Exception("Missing track name or artist - skipping")
@@ -66,48 +297,49 @@ def enrich_spotify_entries(entries: List[SpotifyStreamingEntry], spoticlient: Sp
             # Search for track (catches not found / rate limiting / unknown ex)
             print_log(f"Entry {i+1}/{total_entries}: Searching for '{entry.master_metadata_track_name}' by '{entry.master_metadata_album_artist_name}'")
 
-            # Cleanup track and artist names before search
-            search_track_name = entry.master_metadata_track_name.lower()
-            for shady_part in SPOTIFY_SHADY_PARTS:
-                search_track_name = search_track_name.replace(shady_part, "")
-            
-            search_artist_name = entry.master_metadata_album_artist_name.lower()
-            if search_artist_name == YTM_INVALID_ARTIST:
-                search_artist_name = ""
-        
-            # Call Spotify Client 
-            tracks = spoticlient.search_track(search_track_name, search_artist_name)
-            
+            # Call Spotify Client (or wait for the concurrent search)
+            search_terms = get_search_terms(entry, aliases)
+            if defer_transient and failed_searches is not None and search_terms in failed_searches:
+                raise TransientSearchError("Same search failed temporarily for a previous entry")
+            try:
+                tracks = searches[search_terms].result() if search_terms in searches else spoticlient.search_track(*search_terms)
+            except TransientSearchError:
+                if failed_searches is not None:
+                    failed_searches.add(search_terms)
+                raise
+
             if len(tracks) > 0:
                 print_log(f"Entry {i+1}/{total_entries}:  ✓ Found {len(tracks)} tracks. First: {tracks[0].name} from album '{tracks[0].album_name}' with duration '{tracks[0].duration_ms}'")
-                entry.metadata.tracks = tracks
-                output.processed.append(entry)
+                # own copies: the same search result can serve entries with different names, each one is scored against its own.
+                # The result of a cluster representative is not an exact match for the other titles of the cluster
+                exact_search_match = None if search_terms == get_search_terms(entry) else False
+                entry.metadata.tracks = [track.copy(exact_search_match) for track in tracks]
+                result = RESULT_PROCESSED
 
             else:
                 raise Exception("  ✗ Track not found")
+        except TransientSearchError as e:
+            if defer_transient:
+                print_log(f"Entry {i+1}/{total_entries}: Temporary error - {e} - will be retried at the end")
+                return RESULT_DEFERRED, entry
+            result = set_entry_error(i, total_entries, entry, e)
         except Exception as e:
-            print_log(f"Entry {i+1}/{total_entries}: Error - {e}")
-            entry.metadata.status = ProcessingStatus.ERROR
-            entry.metadata.status_message = str(e)
-            output.errors.append(entry)
+            result = set_entry_error(i, total_entries, entry, e)
 
-    print_log(f"\nEnrichment complete:")
-    print_log(f"  Successfully enriched / have data: {len(output.processed)}")
-    print_log(f"  Failed to find: {len(output.errors)}")
-
-    return output
+    if journal:
+        journal.append(i, result, entry)
+    return result, entry
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Enrich Spotify streaming entries with metadata from Spotify API")
-    parser.add_argument("--file", required=True, help="Input JSON file with Spotify streaming entries")
-    args = parser.parse_args()
+def set_entry_error(i: int, total_entries: int, entry: SpotifyStreamingEntry, error: Exception) -> str:
+    print_log(f"Entry {i+1}/{total_entries}: Error - {error}")
+    entry.metadata.status = ProcessingStatus.ERROR
+    entry.metadata.status_message = str(error)
+    return RESULT_ERROR
 
-    # input file
-    input_file = args.file
-    
-    # Load environment variables
-    load_dotenv()
-    
+def create_spotify_client_from_env() -> SpotifyClient:
+    """
+    Create the Spotify client using the credentials and API call settings from the environment
+    """
     # Get Spotify API credentials
     client_id = os.getenv('SPOTIFY_CLIENT_ID')
     client_secret = os.getenv('SPOTIFY_CLIENT_SECRET')
@@ -117,30 +349,91 @@ if __name__ == "__main__":
     search_results_limit = int(os.getenv('SPOTIFY_SEARCH_RESULTS_LIMIT', 5))
     max_retries = int(os.getenv('SPOTIFY_MAX_RETRIES', 10))
 
-    # Get scoring settings
-    score_tracks_by = os.getenv('SCORE_TRACKS_BY', 'equal_weight')
-    minimum_match_decision_score = float(os.getenv('MINIMUM_MATCH_DECISION_SCORE', 0.9)) * 100
+    # Other endpoints (e.g. the local stand-in server from benchmarks/spotify_api_server.py)
+    api_url = os.getenv('SPOTIFY_API_URL')
+    auth_url = os.getenv('SPOTIFY_AUTH_URL')
 
-    # Initialize Spotify enricher
-    spoticlient = SpotifyClient(client_id, client_secret, market, search_results_limit, max_retries)
+    # Recorded API responses (replaying them needs no credentials and no request rate control)
+    cassette = create_api_cassette_from_env()
+    rate_limiter = RateLimiter(CASSETTE_REPLAY_REQUESTS_PER_SECOND) if cassette and cassette.is_replaying() else create_rate_limiter_from_env()
 
-    # Read Spotify entries
-    entries = read_spotify_entries(input_file)
-    
-    if not entries:
-        print_log("No entries to process")
-        exit(1)
-    
-    # Enrich entries with Spotify metadata
-    processed_entries = enrich_spotify_entries(entries, spoticlient)
+    return SpotifyClient(client_id, client_secret, market, search_results_limit, max_retries, create_search_cache_from_env(),
+                         rate_limiter, api_url, auth_url, cassette)
 
-    # Assign scores to tracks and sort by score
-    score_spotify_entries(processed_entries.processed, score_tracks_by)
+def create_rate_limiter_from_env() -> RateLimiter:
+    """
+    Spotify API rate limiter from the SPOTIFY_REQUESTS_* settings
+    """
+    return RateLimiter(
+        rate=float(os.getenv('SPOTIFY_REQUESTS_PER_SECOND', DEFAULT_REQUESTS_PER_SECOND)),
+        min_rate=float(os.getenv('SPOTIFY_MIN_REQUESTS_PER_SECOND', DEFAULT_MIN_REQUESTS_PER_SECOND)),
+        burst=float(os.getenv('SPOTIFY_REQUESTS_BURST', DEFAULT_REQUESTS_BURST)),
+        base_backoff=float(os.getenv('SPOTIFY_BACKOFF_SECONDS', DEFAULT_BASE_BACKOFF_SECONDS)),
+        cooldown=float(os.getenv('SPOTIFY_RATE_LIMIT_COOLDOWN_SECONDS', DEFAULT_RATE_LIMIT_COOLDOWN_SECONDS))
+    )
 
-    # split into sure scores and scores in doubt
-    matched = []
-    doubt = []
-    for entry in processed_entries.processed:
+def create_search_cache_from_env() -> Optional[SpotifySearchCache]:
+    """
+    Persistent search cache from the SPOTIFY_SEARCH_CACHE_* settings (None if SPOTIFY_SEARCH_CACHE_FILE is set empty)
+    """
+    cache_file = os.getenv('SPOTIFY_SEARCH_CACHE_FILE', DEFAULT_SEARCH_CACHE_FILE)
+    if not cache_file:
+        return None
+
+    ttl_days = float(os.getenv('SPOTIFY_SEARCH_CACHE_TTL_DAYS', DEFAULT_SEARCH_CACHE_TTL_DAYS))
+    not_found_ttl_days = float(os.getenv('SPOTIFY_SEARCH_CACHE_NOT_FOUND_TTL_DAYS', DEFAULT_SEARCH_CACHE_NOT_FOUND_TTL_DAYS))
+    max_mb = float(os.getenv('SPOTIFY_SEARCH_CACHE_MAX_MB', DEFAULT_SEARCH_CACHE_MAX_MB))
+    return SpotifySearchCache(cache_file, ttl_days * 24 * 60 * 60, int(max_mb * 1024 * 1024), not_found_ttl_days * 24 * 60 * 60)
+
+def is_title_clustering_enabled() -> bool:
+    """
+    TITLE_CLUSTERING env setting: search the near-duplicate titles of a history only once
+    """
+    return os.getenv('TITLE_CLUSTERING', 'false').lower() in ('1', 'true', 'yes')
+
+def create_search_aliases(entries: List[SpotifyStreamingEntry], input_file: str) -> Dict[Tuple[str, str], Tuple[str, str]]:
+    """
+    Title clustering: group the near-duplicate searches of the entries (version suffixes, reordered artist credits), so
+    that only one search per cluster runs. The clusters with several searches are exported to output\\clusters for audit.
+    Returns the search to run instead of each clustered search
+    """
+    plays: Dict[Tuple[str, str], int] = {}
+    for entry in entries:
+        if entry.has_spotify_data() or not entry.has_basic_info():
+            continue
+        search_terms = get_search_terms(entry)
+        plays[search_terms] = plays.get(search_terms, 0) + 1
+
+    clusters = cluster_search_terms(plays)
+    grouped = [cluster for cluster in clusters if len(cluster.members) > 1]
+    print_log(f"Title clustering: {len(plays)} distinct searches in {len(clusters)} clusters "
+              f"({len(plays) - len(clusters)} searches saved, {len(grouped)} clusters with variants)")
+
+    export_to_json(grouped, input_file, "clusters", parent_directory="output\\clusters")
+    return get_search_aliases(clusters)
+
+def create_local_catalog_from_env() -> Optional[LocalCatalog]:
+    """
+    Local catalog from the LOCAL_CATALOG_SOURCES setting (files / wildcards separated by ';'), None if not set
+    """
+    sources = [source.strip() for source in os.getenv('LOCAL_CATALOG_SOURCES', '').split(';') if source.strip()]
+    if not sources:
+        return None
+
+    catalog = LocalCatalog.from_files(sources)
+    print_log(f"Local catalog: {len(catalog.tracks)} tracks loaded from {'; '.join(sources)}")
+    return catalog
+
+def split_by_match_score(entries: List[SpotifyStreamingEntry], score_tracks_by: str, minimum_match_decision_score: float) -> tuple[List[SpotifyStreamingEntry], List[SpotifyStreamingEntry]]:
+    """
+    Split scored entries into trusted matches (best track set as the entry info) and entries in doubt
+
+    Returns:
+        tuple: (matched, doubt)
+    """
+    matched = SpotifyStreamingTable()
+    doubt = SpotifyStreamingTable()
+    for entry in entries:
         entry.metadata.match_score = getattr(entry.metadata.tracks[0].match_score, score_tracks_by)
 
         # save original details in metadata
@@ -156,6 +449,82 @@ if __name__ == "__main__":
             entry.metadata.status_message = f"In doubt - score {entry.metadata.match_score:.2f} - needs review"
             doubt.append(entry)
 
+    return matched, doubt
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enrich Spotify streaming entries with metadata from Spotify API")
+    parser.add_argument("--file", required=True, help="Input JSON file with Spotify streaming entries")
+    parser.add_argument("--workers", type=int, help="Number of concurrent Spotify searches (default: SPOTIFY_SEARCH_WORKERS env setting, or 1)")
+    parser.add_argument("--resume", action="store_true", help="Specify in order to continue an interrupted enrichment of the same file from its journal")
+    parser.add_argument("--retry-errors", action="store_true", help="With --resume: search again the entries that failed in the previous run")
+    parser.add_argument("--rebuild", action="store_true", help="Specify in order to only rebuild the output files from the journal of a previous run (no API calls)")
+    args = parser.parse_args()
+
+    # input file
+    input_file = args.file
+    
+    # Load environment variables
+    load_dotenv()
+    
+    # Get scoring settings
+    score_tracks_by = os.getenv('SCORE_TRACKS_BY', 'equal_weight')
+    minimum_match_decision_score = float(os.getenv('MINIMUM_MATCH_DECISION_SCORE', 0.9)) * 100
+
+    if args.rebuild:
+        # Journal of the enriched entries of a previous run
+        journal = EnrichmentJournal(input_file)
+
+        # the journal has the enriched entries, the input file is not needed
+        if not journal.load(check_input=False):
+            print_log(f"No journal found for {input_file}")
+            exit(1)
+        if not journal.is_complete():
+            print_log(f"Warning: the journal is incomplete ({len(journal.results)}/{journal.total_entries} entries), the outputs will only contain these")
+        processed_entries = journal.to_processed_tracks()
+
+    else:
+        # Initialize Spotify enricher
+        spoticlient = create_spotify_client_from_env()
+
+        # Read Spotify entries
+        entries = read_spotify_entries(input_file)
+
+        if not entries:
+            print_log("No entries to process")
+            exit(1)
+
+        # Journal of the enriched entries (for --resume / --rebuild), only resumed with the same title clustering
+        search_aliases = create_search_aliases(entries, input_file) if is_title_clustering_enabled() else None
+        journal = EnrichmentJournal(input_file, search_aliases)
+        if args.resume and journal.load() and args.retry_errors:
+            print_log(f"Retrying {journal.drop_errors()} failed entries")
+
+        # Enrich entries with Spotify metadata
+        workers = args.workers or int(os.getenv('SPOTIFY_SEARCH_WORKERS', 1))
+        artist_prefetch_min_tracks = int(os.getenv('SPOTIFY_ARTIST_PREFETCH_MIN_TRACKS', 0))
+        deferred_retry_rounds = int(os.getenv('SPOTIFY_DEFERRED_RETRY_ROUNDS', DEFERRED_RETRY_ROUNDS))
+        deferred_retry_pause = float(os.getenv('SPOTIFY_DEFERRED_RETRY_PAUSE_SECONDS', DEFERRED_RETRY_PAUSE_SECONDS))
+        journal.open(len(entries), args.resume)
+        try:
+            processed_entries = enrich_spotify_entries(entries, spoticlient, workers, journal, artist_prefetch_min_tracks,
+                                                       create_local_catalog_from_env(), search_aliases, deferred_retry_rounds, deferred_retry_pause)
+        finally:
+            journal.close()
+
+        spoticlient.rate_limiter.log_stats("Spotify")
+        if spoticlient.search_cache:
+            spoticlient.search_cache.log_stats()
+            spoticlient.search_cache.close()
+        if spoticlient.cassette:
+            spoticlient.cassette.log_stats()
+            spoticlient.cassette.close()
+
+    # Assign scores to tracks and sort by score
+    score_spotify_entries(processed_entries.processed, score_tracks_by)
+
+    # split into sure scores and scores in doubt
+    matched, doubt = split_by_match_score(processed_entries.processed, score_tracks_by, minimum_match_decision_score)
+
     # Export enriched data
     export_to_json(matched, input_file, "rich.ok", parent_directory="output\\ok")
     export_to_json(doubt, input_file, "rich.doubt")
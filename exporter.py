@@ -0,0 +1,219 @@
+import argparse
+import glob
+import heapq
+import json
+import os
+import tempfile
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from spotify.constants import (SPOTIFY_EXPORT_FILE_PREFIX, SPOTIFY_EXPORT_MANIFEST_FILE, SPOTIFY_EXPORT_MAX_BYTES,
+                               SPOTIFY_EXPORT_MAX_ENTRIES, SPOTIFY_EXPORT_SORT_RUN_SIZE)
+from utils.entry_files import FORMAT_JSONL, iter_entries, write_entries
+from utils.file_utils import encode_json_item, is_compact_json_enabled
+from utils.simple_logger import print_log
+from utils.timestamps import parse_iso_timestamp
+
+OK_DIRECTORY = "output\\ok"
+EXPORT_DIRECTORY = "output\\spotify"
+
+
+def get_entry_ts(item: dict) -> float:
+    """
+    Sort key of a streaming entry (unix time, entries without ts go first)
+    """
+    ts = item.get("ts") if isinstance(item, dict) else None
+    return parse_iso_timestamp(ts).timestamp() if ts else float("-inf")
+
+
+def sort_entries(input_files: List[str], run_size: int = SPOTIFY_EXPORT_SORT_RUN_SIZE) -> Iterator[dict]:
+    """
+    Stream the entries of all the input files ordered by ts (oldest first).
+    External merge sort: at most run_size entries are held in memory, sorted and spilled to temporary
+    JSON lines files, which are then merged; inputs that fit in one run never touch the disk
+    """
+    with tempfile.TemporaryDirectory(prefix="spotify-export-") as temp_directory:
+        runs = []
+        run = []
+        for input_file in input_files:
+            for item in iter_entries(input_file):
+                run.append(item)
+                if len(run) >= run_size:
+                    run_file = os.path.join(temp_directory, f"run_{len(runs)}.jsonl")
+                    write_entries(sorted(run, key=get_entry_ts), run_file, FORMAT_JSONL)
+                    runs.append(run_file)
+                    run = []
+
+        run.sort(key=get_entry_ts)
+        if not runs:
+            yield from run
+            return
+
+        # heapq.merge is stable: equal timestamps keep the input order
+        yield from heapq.merge(*[iter_entries(run_file) for run_file in runs], run, key=get_entry_ts)
+
+
+def get_export_filename(output_directory: str, first_year: Optional[int], last_year: Optional[int], index: int) -> str:
+    """
+    Spotify export naming: Streaming_History_Audio_<first year>[-<last year>]_<index>.json
+    """
+    if first_year is None:
+        years = "unknown"
+    elif first_year == last_year:
+        years = f"{first_year}"
+    else:
+        years = f"{first_year}-{last_year}"
+    return os.path.join(output_directory, f"{SPOTIFY_EXPORT_FILE_PREFIX}{years}_{index}.json")
+
+
+def read_export_manifest(output_directory: str) -> List[str]:
+    """
+    Files written by the last export into the directory (empty if there was none)
+    """
+    manifest_file = os.path.join(output_directory, SPOTIFY_EXPORT_MANIFEST_FILE)
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as file:
+            return [os.path.join(output_directory, name) for name in json.load(file).get("files", [])]
+    except FileNotFoundError:
+        return []
+    except json.JSONDecodeError:
+        print_log(f"Error: Invalid JSON in {manifest_file}, ignoring it")
+        return []
+
+
+def write_export_manifest(output_directory: str, output_files: List[str]):
+    with open(os.path.join(output_directory, SPOTIFY_EXPORT_MANIFEST_FILE), 'w', encoding='utf-8') as output:
+        json.dump({"files": [os.path.basename(output_file) for output_file in output_files]}, output, indent=2)
+
+
+def get_previous_export(output_directory: str, overwrite: bool = False) -> List[str]:
+    """
+    Files of the previous export into the directory, which would mix with the new parts (replaced once the new
+    ones are written). Other Streaming_History_Audio_*.json files (e.g. a real Spotify export) are only included
+    with overwrite, otherwise FileExistsError is raised before anything is written
+    """
+    existing_files = set(glob.glob(os.path.join(output_directory, f"{SPOTIFY_EXPORT_FILE_PREFIX}*.json")))
+    foreign_files = existing_files - set(read_export_manifest(output_directory))
+    if foreign_files and not overwrite:
+        raise FileExistsError(f"{len(foreign_files)} {SPOTIFY_EXPORT_FILE_PREFIX}*.json files not written by this script are in "
+                              f"{output_directory} (e.g. {sorted(foreign_files)[0]})")
+    return sorted(existing_files)
+
+
+def replace_previous_export(output_directory: str, parts: List[Tuple[str, str]], previous_files: List[str]):
+    """
+    Move the written (temporary file, output file) parts in place, then remove the files of the previous export
+    that were not overwritten. The manifest lists both until the end, so an interruption leaves no unknown files
+    """
+    output_files = [output_file for _, output_file in parts]
+    write_export_manifest(output_directory, sorted(set(previous_files) | set(output_files)))
+    for part_file, output_file in parts:
+        os.replace(part_file, output_file)
+    for old_file in set(previous_files) - set(output_files):
+        os.remove(old_file)
+    write_export_manifest(output_directory, output_files)
+
+
+def export_streaming_history(entries: Iterable[dict], output_directory: str = EXPORT_DIRECTORY,
+                             max_entries: int = SPOTIFY_EXPORT_MAX_ENTRIES, max_bytes: int = SPOTIFY_EXPORT_MAX_BYTES,
+                             compact: bool = False, keep_metadata: bool = False, overwrite: bool = False) -> List[str]:
+    """
+    Stream the (sorted) entries into rolling JSON array files of at most max_entries entries / max_bytes bytes
+    (a single entry bigger than max_bytes still gets its own file). Returns the written files.
+    The parts are written to temporary files first: the previous export is only replaced once all of them are written,
+    and only its own files are replaced, unless overwrite (see get_previous_export)
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    previous_files = get_previous_export(output_directory, overwrite)
+
+    parts = []
+    output = None
+    count = written = 0
+    first_year = last_year = None
+
+    def close_part():
+        output.write(b"\n]")
+        output.close()
+        output_file = get_export_filename(output_directory, first_year, last_year, len(parts))
+        parts.append((output.name, output_file))
+        print_log(f"Part written: {output_file} ({count} entries, moved in place once all the parts are written)")
+
+    try:
+        for item in entries:
+            if not keep_metadata:
+                item.pop("metadata", None)
+            encoded = encode_json_item(item, compact).encode('utf-8')
+            separator = b",\n" if count else b"\n"
+
+            if output and (count >= max_entries or written + len(separator) + len(encoded) + 2 > max_bytes):
+                close_part()
+                output = None
+
+            if output is None:
+                output = open(os.path.join(output_directory, f"{SPOTIFY_EXPORT_FILE_PREFIX}part_{len(parts)}.json.tmp"), 'wb')
+                output.write(b"[")
+                count, written = 0, 1
+                first_year = last_year = None
+                separator = b"\n"
+
+            output.write(separator)
+            output.write(encoded)
+            count += 1
+            written += len(separator) + len(encoded)
+
+            if item.get("ts"):
+                last_year = parse_iso_timestamp(item["ts"]).year
+                first_year = first_year or last_year
+
+        if output:
+            close_part()
+    except BaseException:
+        # the previous export stays as it was
+        if output and not output.closed:
+            output.close()
+            os.remove(output.name)
+        for part_file, _ in parts:
+            os.remove(part_file)
+        raise
+
+    if parts:
+        replace_previous_export(output_directory, parts, previous_files)
+    return [output_file for _, output_file in parts]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the final (ok / validated) files as Spotify-like Streaming_History_Audio_*.json files, ordered by time and split by size")
+    parser.add_argument("--files", nargs="+", help=f"Input JSON files with Spotify streaming entries (default: all the files in {OK_DIRECTORY})")
+    parser.add_argument("--output-directory", default=EXPORT_DIRECTORY, help=f"Output directory (default: {EXPORT_DIRECTORY})")
+    parser.add_argument("--max-entries", type=int, default=SPOTIFY_EXPORT_MAX_ENTRIES, help=f"Maximum number of entries per file (default: {SPOTIFY_EXPORT_MAX_ENTRIES})")
+    parser.add_argument("--max-bytes", type=int, default=SPOTIFY_EXPORT_MAX_BYTES, help=f"Maximum size of a file in bytes (default: {SPOTIFY_EXPORT_MAX_BYTES})")
+    parser.add_argument("--overwrite", action="store_true", help="Specify in order to also delete the Streaming_History_Audio_*.json files of the output directory that were not written by this script")
+    parser.add_argument("--keep-metadata", action="store_true", help="Specify in order to keep the processing metadata (matching details) in the exported entries")
+    args = parser.parse_args()
+
+    # Load environment variables
+    load_dotenv()
+
+    input_files = args.files or sorted(glob.glob(os.path.join(OK_DIRECTORY, "*.json")))
+    if not input_files:
+        print_log(f"No input files found in {OK_DIRECTORY}")
+        exit(1)
+
+    try:
+        output_files = export_streaming_history(sort_entries(input_files), args.output_directory, args.max_entries, args.max_bytes,
+                                                is_compact_json_enabled(), args.keep_metadata, args.overwrite)
+    except FileExistsError as e:
+        print_log(f"Error: {e}; choose another --output-directory, or use --overwrite to delete them")
+        exit(1)
+    except FileNotFoundError as e:
+        print_log(f"Error: {e.filename} not found")
+        exit(1)
+    except json.JSONDecodeError as e:
+        print_log(f"Error: Invalid JSON in one of the input files: {e}")
+        exit(1)
+
+    if not output_files:
+        print_log("No entries to export")
+        exit(1)
+
+    print_log(f"Exported {len(input_files)} files into {len(output_files)} Spotify-like files in {args.output_directory}")
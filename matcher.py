@@ -6,17 +6,17 @@ from rapidfuzz import fuzz
 
 from objects.score_metadata import MatchScore
 from spotify.spotify_listening_history import SpotifyStreamingEntry
+from spotify.spotify_streaming_table import SpotifyStreamingTable
+from utils.entry_files import iter_entries
 from utils.file_utils import export_to_json
 from utils.simple_logger import print_log
 
-def read_spotify_entries(input_file: str) -> List[SpotifyStreamingEntry]:
+def read_spotify_entries(input_file: str) -> SpotifyStreamingTable:
     """
-    Read Spotify streaming entries from JSON file
+    Read Spotify streaming entries from JSON file, into a columnar table (see SpotifyStreamingTable)
     """
     try:
-        with open(input_file, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-            entries = [SpotifyStreamingEntry.from_dict(item) for item in data]
+        entries = SpotifyStreamingTable.from_entries(SpotifyStreamingEntry.from_dict(item) for item in iter_entries(input_file))
         
         return entries
     
@@ -75,7 +75,7 @@ def score_spotify_entries(tracks: List[SpotifyStreamingEntry], score_by: str):
     for track in tracks:
         for match in track.metadata.tracks:
             if match.exact_search_match:
-                match.match_score = MatchScore.max_score()
+                match.match_score = MatchScore.full_score()
             else:
                 match.match_score = calculate_track_similarity(
                     track.master_metadata_track_name,
@@ -107,4 +107,4 @@ if __name__ == "__main__":
     score_spotify_entries(entries)
 
     # Export scores to json
-    export_to_json(entries, input_file, "scored")
\ No newline at end of file
+    export_to_json(entries, input_file, "scored", intermediate=True)
\ No newline at end of file
@@ -0,0 +1,101 @@
+import argparse
+import heapq
+import json
+from typing import Iterator, List, Optional
+
+from dotenv import load_dotenv
+from utils.file_utils import generate_output_filename, is_compact_json_enabled, write_json_array
+from utils.json_stream import iter_json_array
+from utils.simple_logger import print_log
+from utils.timestamps import parse_iso_timestamp
+
+
+def get_entry_time(item: dict) -> float:
+    """
+    Sort key of a watch history item (unix time, entries without time go last)
+    """
+    time = item.get("time") if isinstance(item, dict) else None
+    return parse_iso_timestamp(time).timestamp() if time else float("-inf")
+
+
+def get_entry_key(item: dict) -> tuple:
+    """
+    Identity of a play: (time, titleUrl); entries without URL (e.g. removed videos) use the title instead
+    """
+    return item.get("time"), item.get("titleUrl") or item.get("title")
+
+
+def iter_history_entries(input_file: str) -> Iterator[dict]:
+    """
+    Stream the entries of a watch history file, warning once if it is not newest-first
+    """
+    previous_time = float("inf")
+    warned = False
+    for item in iter_json_array(input_file):
+        item_time = get_entry_time(item)
+        if item_time > previous_time and not warned:
+            print_log(f"Warning: {input_file} is not ordered newest-first, duplicates might not be detected")
+            warned = True
+        previous_time = item_time
+        yield item
+
+
+def merge_watch_histories(input_files: List[str]) -> Iterator[dict]:
+    """
+    K-way merge of several watch history files (each newest-first, as exported by Takeout) by time,
+    dropping exact duplicates on (time, titleUrl).
+    Since the merged stream is ordered by time, duplicates are adjacent in time, so only the keys of the
+    current timestamp are kept in the hash index (bounded memory, whatever the size of the inputs)
+    """
+    current_time = None
+    seen_keys = set()
+
+    for item in heapq.merge(*[iter_history_entries(f) for f in input_files], key=get_entry_time, reverse=True):
+        item_time = get_entry_time(item)
+        if item_time != current_time:
+            current_time = item_time
+            seen_keys.clear()
+
+        key = get_entry_key(item)
+        if key in seen_keys:
+            continue
+
+        seen_keys.add(key)
+        yield item
+
+
+def export_merged_histories(input_files: List[str], output_file: Optional[str] = None) -> Optional[str]:
+    """
+    Merge the input files and write the result, one entry at a time, as a single watch history JSON array
+    """
+    output_file = output_file or generate_output_filename(input_files[0], "merged")
+
+    try:
+        total = write_json_array(merge_watch_histories(input_files), output_file, is_compact_json_enabled())
+
+        print_log(f"Merged {len(input_files)} files into {total} entries")
+        print_log(f"Data written to: {output_file}")
+        return output_file
+
+    except FileNotFoundError as e:
+        print_log(f"Error: {e.filename} not found")
+        return None
+    except json.JSONDecodeError as e:
+        print_log(f"Error: Invalid JSON in one of the input files: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge several (overlapping) YouTube Music watch history exports into one, without duplicates")
+    parser.add_argument("--files", required=True, nargs="+", help="Input watch history JSON files")
+    parser.add_argument("--output", help="Output file path (default: output\\<first-file>.merged.json)")
+    args = parser.parse_args()
+
+    # Load environment variables
+    load_dotenv()
+
+    merged_file = export_merged_histories(args.files, args.output)
+    if not merged_file:
+        exit(1)
+
+    print_log("Merge complete. Use the merged file as input for the sanitization step.")
@@ -15,4 +15,13 @@ SPLIT_CHARACTERS = [r"-", r"💕"]
 RG_SPLIT_CHARS = r"[" + "".join(SPLIT_CHARACTERS) + r"]"
 
 # Strings that are removed from the final artist / track name (only for videos watched on YTM)
-FORBIDDEN_STRINGS = [" - ", " 💕 ", r" \| ", " ✖️ ", " ALBUM", "ALBUM "]
\ No newline at end of file
+FORBIDDEN_STRINGS = [" - ", " 💕 ", r" \| ", " ✖️ ", " ALBUM", "ALBUM "]
+
+# Max number of compiled channel name patterns kept in memory (video sanitization)
+CHANNEL_PATTERN_CACHE_SIZE = 4096
+
+# Max number of sanitized (video title, channel) pairs kept in memory (video sanitization)
+VIDEO_TITLE_CACHE_SIZE = 65536
+
+# Number of raw history entries sent to a worker process at once (parallel sanitization)
+SANITIZER_CHUNK_SIZE = 5000
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from objects.spotify_processed_track import SpotifyProcessedTracks
+from spotify.spotify_listening_history import SpotifyStreamingEntry
+from utils.entry_files import encode_json_line, iter_entries_with_offsets
+from utils.file_utils import generate_output_filename
+from utils.simple_logger import print_log
+from utils.stage_manifest import hash_file
+
+JOURNALS_DIRECTORY = "output\\journals"
+
+# Journal results
+RESULT_PROCESSED = "processed"
+RESULT_ERROR = "error"
+
+
+def hash_search_aliases(search_aliases: Optional[Dict[Tuple[str, str], Tuple[str, str]]]) -> Optional[str]:
+    """
+    SHA-256 of the search aliases (None without title clustering)
+    """
+    if search_aliases is None:
+        return None
+    items = sorted([list(search_terms), list(alias)] for search_terms, alias in search_aliases.items())
+    return hashlib.sha256(json.dumps(items, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class EnrichmentJournal:
+    """
+    Append-only JSON lines log of an enrichment run: a header (input file hash, search aliases hash, number of entries) followed by
+    one line per enriched entry (input index, result, entry with the found tracks), flushed as soon as it is known.
+    A resumed run skips the journaled entries; the complete journal alone is enough to rebuild the outputs
+    """
+    def __init__(self, input_file: str, search_aliases: Optional[Dict[Tuple[str, str], Tuple[str, str]]] = None):
+        self.input_file = input_file
+        # the results depend on the searches that ran instead of others (title clustering)
+        self.aliases_hash = hash_search_aliases(search_aliases)
+        self.journal_file = generate_output_filename(input_file, "enrich.journal", new_extension=".jsonl", parent_directory=JOURNALS_DIRECTORY)
+        self.total_entries: Optional[int] = None
+        # entries only for the loaded results (see append)
+        self.results: Dict[int, Tuple[str, Optional[SpotifyStreamingEntry]]] = {}
+        self.valid_size = 0
+        self.output = None
+
+    def load(self, check_input: bool = True) -> bool:
+        """
+        Read the results of a previous run; False if there is no (usable) journal for the current input file
+        """
+        self.results = {}
+        if not os.path.exists(self.journal_file):
+            return False
+
+        try:
+            lines = iter_entries_with_offsets(self.journal_file)
+            self.valid_size, header = next(lines, (0, None))
+            if not header or (check_input and header.get("input_hash") != hash_file(self.input_file)):
+                print_log(f"Journal {self.journal_file} was written for a different input file, ignoring it")
+                return False
+            if check_input and header.get("aliases_hash") != self.aliases_hash:
+                print_log(f"Journal {self.journal_file} was written with other title clustering settings, ignoring it")
+                return False
+
+            self.total_entries = header.get("entries")
+            # later lines win (entries re-enriched by a resumed run)
+            for self.valid_size, line in lines:
+                self.results[line["index"]] = (line["result"], SpotifyStreamingEntry.from_dict(line["entry"]))
+        except (json.JSONDecodeError, KeyError) as e:
+            print_log(f"Error: Invalid journal {self.journal_file} ({e}), ignoring it")
+            self.results = {}
+            return False
+
+        return True
+
+    def open(self, total_entries: int, resume: bool):
+        """
+        Start writing: append to the loaded journal when resuming, otherwise start a new one
+        """
+        if resume and self.results:
+            # drop a line cut by the interruption before appending
+            self.output = open(self.journal_file, 'r+b')
+            self.output.truncate(self.valid_size)
+            self.output.seek(self.valid_size)
+            return
+
+        self.results = {}
+        self.total_entries = total_entries
+        self.output = open(self.journal_file, 'wb')
+        self.output.write(encode_json_line({"input_file": self.input_file, "input_hash": hash_file(self.input_file),
+                                             "aliases_hash": self.aliases_hash, "entries": total_entries}))
+        self.output.flush()
+
+    def append(self, index: int, result: str, entry: SpotifyStreamingEntry):
+        # the entry itself is only written: the running enrichment has it, a resumed one reads it back
+        self.results[index] = (result, None)
+        self.output.write(encode_json_line({"index": index, "result": result, "entry": entry.to_dict()}))
+        self.output.flush()
+
+    def drop_errors(self) -> int:
+        """
+        Forget the failed entries, so that a resumed run enriches them again
+        """
+        errors = [index for index, (result, _) in self.results.items() if result == RESULT_ERROR]
+        for index in errors:
+            del self.results[index]
+        return len(errors)
+
+    def to_processed_tracks(self) -> SpotifyProcessedTracks:
+        """
+        Journaled results in input order, as returned by the enrichment
+        """
+        output = SpotifyProcessedTracks(processed=[], doubt=[], errors=[])
+        for index in sorted(self.results):
+            result, entry = self.results[index]
+            (output.processed if result == RESULT_PROCESSED else output.errors).append(entry)
+        return output
+
+    def is_complete(self) -> bool:
+        return self.total_entries is not None and len(self.results) >= self.total_entries
+
+    def close(self):
+        if self.output:
+            self.output.close()
+            self.output = None
@@ -0,0 +1,30 @@
+import hashlib
+import json
+from typing import List
+
+
+class HistoryWatermark:
+    """
+    Marks how far a watch history has already been processed: the latest processed entry time
+    and the hashes of all the entries having exactly that time (needed to tell them apart from new ones)
+    """
+    def __init__(self, time: str = "", entry_hashes: List[str] = None):
+        self.time = time
+        self.entry_hashes = entry_hashes or []
+
+    @staticmethod
+    def hash_entry(item: dict) -> str:
+        return hashlib.sha1(json.dumps(item, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def to_dict(self):
+        return {
+            "time": self.time,
+            "entry_hashes": self.entry_hashes
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            time=data.get("time", ""),
+            entry_hashes=data.get("entry_hashes", [])
+        )
@@ -13,6 +13,8 @@ class ProcessingStatus(Enum):
     NO_MATCH = "NO_MATCH"
 
 class YTMProcessingMetadata:
+    __slots__ = ("status", "status_message", "is_video", "ytm_url", "original_channel", "original_title")
+
     def __init__(self, status: ProcessingStatus = ProcessingStatus.OK, status_message: str = "", is_video: bool = False,
             ytm_url: str = "", original_channel: str = "", original_title: str = ""):
         self.status = status
@@ -44,6 +46,9 @@ class YTMProcessingMetadata:
         )
 
 class SpotifyProcessingMetadata:
+    __slots__ = ("status", "status_message", "match_score", "original_master_metadata_track_name",
+                 "original_master_metadata_album_artist_name", "tracks")
+
     def __init__(self, status: ProcessingStatus = ProcessingStatus.OK, status_message: str = "", match_score: float = None,
                  original_master_metadata_track_name: str = "", original_master_metadata_album_artist_name: str = "",
                  tracks: List[TrackInfo] = None):
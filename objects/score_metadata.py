@@ -1,4 +1,6 @@
 class MatchScore:
+    __slots__ = ("track_score", "artist_score", "equal_weight", "track_heavy", "artist_heavy", "min_score", "max_score")
+
     def __init__(self, track_score: float = 0.0, artist_score: float = 0.0, equal_weight: float = 0.0, track_heavy: float = 0.0, artist_heavy: float = 0.0, min_score: float = 0.0, max_score: float = 0.0):
         self.track_score = track_score
         self.artist_score = artist_score
@@ -20,7 +22,7 @@ class MatchScore:
         }
     
     @classmethod
-    def max_score(cls):
+    def full_score(cls):
         return cls(100.0, 100.0, 100.0, 100.0, 100.0, 100.0, 100.0)
 
     @classmethod
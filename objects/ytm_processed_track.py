@@ -5,6 +5,8 @@ from objects.process_metadata import YTMProcessingMetadata
 from ytm.ytm_watch_history import YTMWatchHistoryEntry
 
 class YTMProcessedTrack:
+    __slots__ = ("timestamp_iso", "timestamp_unix", "title", "artist", "metadata")
+
     def __init__(self, timestamp_iso: str = "", timestamp_unix: Optional[int] = None, title: str = "", artist: str = "", metadata: YTMProcessingMetadata = None):
         self.timestamp_iso = timestamp_iso
         self.timestamp_unix = timestamp_unix
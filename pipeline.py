@@ -0,0 +1,164 @@
+import json
+import os
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+from converter import read_additional_data_from_env
+from enricher import (create_local_catalog_from_env, create_search_aliases, create_spotify_client_from_env, enrich_spotify_entries,
+                      is_title_clustering_enabled, read_spotify_entries, split_by_match_score)
+from matcher import score_spotify_entries
+from objects.enrichment_journal import EnrichmentJournal
+from objects.spotify_processed_track import SpotifyProcessedTracks
+from objects.ytm_processed_track import YTMProcessedResults, YTMProcessedTrack
+from sanitizer import process_youtube_music_entries
+from spotify.constants import DEFERRED_RETRY_PAUSE_SECONDS, DEFERRED_RETRY_ROUNDS
+from spotify.local_catalog import LocalCatalog
+from spotify.spotify_client import SpotifyClient
+from spotify.spotify_streaming_table import SpotifyStreamingTable
+from utils.entry_files import iter_entries
+from utils.file_utils import export_to_json, generate_output_filename, get_export_extension
+from utils.simple_logger import print_log
+
+
+class Pipeline:
+    """
+    In-process runner for the automatic steps (sanitize -> convert -> enrich -> score).
+    Stage outputs stay in memory and are handed to the next stage directly; they are identified by
+    the same file names the individual scripts write, so the pipeline can start from any existing file.
+    A single Spotify client (and its search cache) is shared by all the enrichment runs.
+    """
+    def __init__(self, checkpoints: bool = True):
+        """
+        checkpoints: also write every stage output to disk (needed for manual reviews / re-runs)
+        """
+        load_dotenv()
+
+        self.checkpoints = checkpoints
+        self.outputs: Dict[str, list] = {}
+        self._spoticlient: Optional[SpotifyClient] = None
+        self._local_catalog: Optional[LocalCatalog] = None
+        self._local_catalog_loaded = False
+
+        # scoring settings
+        self.score_tracks_by = os.getenv('SCORE_TRACKS_BY', 'equal_weight')
+        self.minimum_match_decision_score = float(os.getenv('MINIMUM_MATCH_DECISION_SCORE', 0.9)) * 100
+
+        # number of concurrent Spotify searches
+        self.search_workers = int(os.getenv('SPOTIFY_SEARCH_WORKERS', 1))
+
+        # artists with at least this many distinct tracks get their catalog prefetched (0 = disabled)
+        self.artist_prefetch_min_tracks = int(os.getenv('SPOTIFY_ARTIST_PREFETCH_MIN_TRACKS', 0))
+
+        # retries of the searches failing temporarily, at the end of the enrichment
+        self.deferred_retry_rounds = int(os.getenv('SPOTIFY_DEFERRED_RETRY_ROUNDS', DEFERRED_RETRY_ROUNDS))
+        self.deferred_retry_pause = float(os.getenv('SPOTIFY_DEFERRED_RETRY_PAUSE_SECONDS', DEFERRED_RETRY_PAUSE_SECONDS))
+
+        # near-duplicate titles searched once
+        self.title_clustering = is_title_clustering_enabled()
+
+    @property
+    def spoticlient(self) -> SpotifyClient:
+        # created on first use (sanitization / conversion do not need the API)
+        if not self._spoticlient:
+            self._spoticlient = create_spotify_client_from_env()
+        return self._spoticlient
+
+    @property
+    def local_catalog(self) -> Optional[LocalCatalog]:
+        # loaded on first use (None if not configured); the tracks found by the enrichments of this run are added to it
+        if not self._local_catalog_loaded:
+            self._local_catalog = create_local_catalog_from_env()
+            self._local_catalog_loaded = True
+        return self._local_catalog
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return os.path.normcase(os.path.normpath(file_path))
+
+    def _save(self, data: list, input_file: str, suffix: str, parent_directory: str = "output", intermediate: bool = True) -> str:
+        """
+        Keep a stage output in memory (and on disk if checkpoints are enabled); returns its file name
+        """
+        output_file = generate_output_filename(input_file, suffix, new_extension=get_export_extension(intermediate), parent_directory=parent_directory)
+        self.outputs[self._key(output_file)] = data
+        if self.checkpoints:
+            export_to_json(data, input_file, suffix, parent_directory=parent_directory, intermediate=intermediate)
+        return output_file
+
+    def _load(self, file_path: str) -> Optional[list]:
+        """
+        Stage output from memory; None if not produced by this pipeline
+        """
+        return self.outputs.get(self._key(file_path))
+
+    def sanitize(self, input_file: str, ignore_videos: bool = False) -> YTMProcessedResults:
+        processed = process_youtube_music_entries(input_file, ignore_videos)
+        if not processed:
+            return YTMProcessedResults(songs=[], music_videos=[], errors=[], skipped=[])
+
+        print_log(f"Found {len(processed.songs)} songs, {len(processed.music_videos)} music videos (skipped {len(processed.skipped)} entries)")
+        print_log(f"Found {len(processed.errors)} errors")
+
+        self._save(processed.songs, input_file, "songs")
+        self._save(processed.music_videos, input_file, "videos", intermediate=False)
+        self._save(processed.errors, input_file, "errors", parent_directory="output\\errors", intermediate=False)
+        self._save(processed.skipped, input_file, "skipped", intermediate=False)
+        return processed
+
+    def convert(self, input_file: str) -> SpotifyStreamingTable:
+        ytm_tracks = self._load(input_file)
+        if ytm_tracks is None:
+            try:
+                ytm_tracks = [YTMProcessedTrack.from_dict(item) for item in iter_entries(input_file)]
+            except (FileNotFoundError, json.JSONDecodeError) as e:
+                print_log(f"Error reading {input_file}: {e}")
+                return []
+
+        # columnar table instead of a list of entries: same interface, a fraction of the memory
+        spotify_entries = SpotifyStreamingTable.from_ytm_tracks(ytm_tracks, read_additional_data_from_env())
+        print_log(f"Successfully converted {len(spotify_entries)} YTM tracks to Spotify format")
+
+        self._save(spotify_entries, input_file, "spotify")
+        return spotify_entries
+
+    def enrich(self, input_file: str, resume: bool = False) -> SpotifyProcessedTracks:
+        """
+        Enrich + score; processed contains the trusted matches, doubt the entries that need review.
+        resume: skip the entries already enriched by an interrupted run (journal)
+        """
+        entries = self._load(input_file)
+        if entries is None:
+            entries = read_spotify_entries(input_file)
+
+        if not entries:
+            print_log("No entries to process")
+            return SpotifyProcessedTracks(processed=[], doubt=[], errors=[])
+
+        search_aliases = create_search_aliases(entries, input_file) if self.title_clustering else None
+
+        journal = EnrichmentJournal(input_file, search_aliases)
+        if resume:
+            journal.load()
+        journal.open(len(entries), resume)
+        try:
+            processed_entries = enrich_spotify_entries(entries, self.spoticlient, self.search_workers, journal, self.artist_prefetch_min_tracks,
+                                                       self.local_catalog, search_aliases, self.deferred_retry_rounds, self.deferred_retry_pause)
+        finally:
+            journal.close()
+        self.spoticlient.rate_limiter.log_stats("Spotify")
+        if self.spoticlient.search_cache:
+            self.spoticlient.search_cache.log_stats()
+        if self.spoticlient.cassette:
+            self.spoticlient.cassette.log_stats()
+        if self.local_catalog:
+            for entry in processed_entries.processed:
+                for track in entry.metadata.tracks:
+                    self.local_catalog.add(track)
+        score_spotify_entries(processed_entries.processed, self.score_tracks_by)
+        matched, doubt = split_by_match_score(processed_entries.processed, self.score_tracks_by, self.minimum_match_decision_score)
+
+        self._save(matched, input_file, "rich.ok", parent_directory="output\\ok", intermediate=False)
+        self._save(doubt, input_file, "rich.doubt", intermediate=False)
+        self._save(processed_entries.errors, input_file, "rich.errors", parent_directory="output\\errors", intermediate=False)
+        return SpotifyProcessedTracks(processed=matched, doubt=doubt, errors=processed_entries.errors)
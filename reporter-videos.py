@@ -4,6 +4,7 @@ import os
 import csv
 from typing import List, Dict, Tuple
 from spotify.spotify_listening_history import SpotifyStreamingEntry
+from utils.entry_files import read_entries
 from utils.file_utils import export_to_csv, export_to_json, generate_output_filename, open_file
 from utils.simple_logger import print_log
 import subprocess
@@ -15,10 +16,7 @@ def read_video_entries(input_file: str) -> List[Dict]:
     Read video entries from JSON file
     """
     try:
-        with open(input_file, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        
-        return data
+        return read_entries(input_file)
     
     except FileNotFoundError:
         print_log(f"Error: {input_file} not found")
@@ -235,6 +233,6 @@ if __name__ == "__main__":
         updated_entries = apply_csv_changes(entries, csv_rows)
 
         # Save updated entries back to JSON
-        export_to_json(updated_entries, input_file, suffix="reviewed")
+        export_to_json(updated_entries, input_file, suffix="reviewed", intermediate=True)
 
         print_log(f"Processing complete. {len(updated_entries)} entries processed.")
@@ -5,18 +5,18 @@ import csv
 from typing import List
 from objects.process_metadata import ProcessingStatus
 from spotify.spotify_listening_history import SpotifyStreamingEntry
+from spotify.spotify_streaming_table import SpotifyStreamingTable
+from utils.entry_files import iter_entries
 from utils.file_utils import export_to_csv, export_to_json, generate_output_filename, open_file
 from utils.simple_logger import print_log
 
 
-def read_spotify_entries(input_file: str) -> List[SpotifyStreamingEntry]:
+def read_spotify_entries(input_file: str) -> SpotifyStreamingTable:
     """
-    Read Spotify streaming entries from JSON file
+    Read Spotify streaming entries from JSON file, into a columnar table (see SpotifyStreamingTable)
     """
     try:
-        with open(input_file, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-            entries = [SpotifyStreamingEntry.from_dict(item) for item in data]
+        entries = SpotifyStreamingTable.from_entries(SpotifyStreamingEntry.from_dict(item) for item in iter_entries(input_file))
         
         return entries
     
@@ -140,8 +140,8 @@ def import_choices(entries: List[SpotifyStreamingEntry], choices: List[str]) ->
         }
 
     # Process JSON entries and process based on CSV choices
-    output_entries = []
-    invalid_entries = []
+    output_entries = SpotifyStreamingTable()
+    invalid_entries = SpotifyStreamingTable()
 
     for i in range(len(entries)):
         entry = entries[i]
@@ -1,20 +1,65 @@
 import json
+import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterator, List, Optional
 
-from objects.constants import FORBIDDEN_STRINGS, RG_SPLIT_CHARS, YT_MUSIC_TRACK_IDENTIFIER
+from objects.constants import CHANNEL_PATTERN_CACHE_SIZE, FORBIDDEN_STRINGS, RG_SPLIT_CHARS, SANITIZER_CHUNK_SIZE, VIDEO_TITLE_CACHE_SIZE, YT_MUSIC_HEADER, YT_MUSIC_TRACK_IDENTIFIER
 import argparse
+from dotenv import load_dotenv
 
+from objects.history_watermark import HistoryWatermark
 from objects.ytm_processed_track import YTMProcessedResults, YTMProcessedTrack
 
-from utils.file_utils import export_to_json
+from utils.file_utils import export_to_json, generate_output_filename, get_delta_name
+from utils.json_stream import iter_json_array
 from utils.simple_logger import print_log
-from utils.timestamps import convert_to_unix_timestamp
+from utils.timestamps import convert_to_unix_timestamp, parse_iso_timestamp
 from ytm.ytm_watch_history import YTMWatchHistoryEntry
 
+# Video sanitization rules, compiled once
+OFFICIAL_TAGS_PATTERN = re.compile(
+    r"([-|]\s*)?\(?(?:Official Music Video|Music Video|Official Lyric Video|Official Visual Video|Official Video|Official Audio|Official Track|Official|Videoclip Oficial|Video Oficial|Videoclip|Visualizer|Audio)\)?(?:\s*[-|])?",
+    flags=re.IGNORECASE
+)
+ARTIST_TRACK_SPLIT_PATTERN = re.compile(r"(.+)(\s" + RG_SPLIT_CHARS + r"\s)(.+)", flags=re.IGNORECASE)
+FORBIDDEN_STRINGS_PATTERNS = [re.compile(pattern, flags=re.IGNORECASE|re.UNICODE) for pattern in FORBIDDEN_STRINGS]
+FORBIDDEN_STRINGS_PATTERN = re.compile("|".join(f"(?:{pattern})" for pattern in FORBIDDEN_STRINGS), flags=re.IGNORECASE|re.UNICODE)
+
+@lru_cache(maxsize=CHANNEL_PATTERN_CACHE_SIZE)
+def get_channel_patterns(channel: str) -> tuple[re.Pattern, re.Pattern]:
+    """
+    Compiled patterns matching the channel name next to a separator (<channel> - ... and ... - <channel>).
+    The channel name is escaped, so names containing regex characters are matched literally
+    """
+    channel = re.escape(channel)
+    return (
+        re.compile(r"(" + channel + r")(\s" + RG_SPLIT_CHARS + r"\s)", flags=re.IGNORECASE|re.UNICODE),
+        re.compile(r"(\s" + RG_SPLIT_CHARS + r"\s)(" + channel + r")", flags=re.IGNORECASE|re.UNICODE),
+    )
+
+def remove_forbidden_strings(text: str) -> str:
+    """
+    Replace all FORBIDDEN_STRINGS with a space.
+    A single scan with the combined pattern rules out the common case (nothing to remove);
+    otherwise the rules are applied one by one, since consecutive matches can share the surrounding spaces
+    """
+    if not FORBIDDEN_STRINGS_PATTERN.search(text):
+        return text.strip()
+
+    for pattern in FORBIDDEN_STRINGS_PATTERNS:
+        text = pattern.sub(" ", text).strip()
+    return text
+
+@lru_cache(maxsize=VIDEO_TITLE_CACHE_SIZE)
 def sanitize_video_track_info(track_name: str, artist_name: str) -> tuple[str, str]:
     """
     Sanitize track name and artist name for video entries by removing official tags
     and extracting artist information from the title.
+    Memoized on (original title, original channel), since the same video repeats a lot in a history;
+    hit / miss counters are available through sanitize_video_track_info.cache_info()
     
     Returns:
         tuple: (track_name, artist_name)
@@ -22,40 +67,78 @@ def sanitize_video_track_info(track_name: str, artist_name: str) -> tuple[str, s
     original_channel = artist_name
     
     # Remove official tags from title
-    officialTagsStripping = [
-        r"([-|]\s*)?\(?(?:Official Music Video|Music Video|Official Lyric Video|Official Visual Video|Official Video|Official Audio|Official Track|Official|Videoclip Oficial|Video Oficial|Videoclip|Visualizer|Audio)\)?(?:\s*[-|])?"
-    ]
-    for pattern in officialTagsStripping:
-        track_name = re.sub(pattern, "", track_name, flags=re.IGNORECASE).strip()
+    track_name = OFFICIAL_TAGS_PATTERN.sub("", track_name).strip()
     
     # Match channel name against title and clean
-    artistTagsStripping = [
-        r"(" + original_channel + r")(\s" + RG_SPLIT_CHARS + r"\s)",
-        r"(\s" + RG_SPLIT_CHARS + r"\s)(" + original_channel + ")",
-    ]
     channelMatched = False
-    originalTrackName = track_name
-    for pattern in artistTagsStripping:
-        track_name = re.sub(pattern, "", track_name, flags=re.IGNORECASE|re.UNICODE).strip()
-        channelMatched = channelMatched or track_name != originalTrackName
+    for pattern in get_channel_patterns(original_channel):
+        track_name, channel_matches = pattern.subn("", track_name)
+        track_name = track_name.strip()
+        channelMatched = channelMatched or channel_matches > 0
 
     # extract artist from title if different from channel, format <artist><separator><track>
     # (can't match other way since can't know what part is artist what part is track)
     if not channelMatched:
-        artistTagsStripping = r"(.+)(\s" + RG_SPLIT_CHARS + r"\s)(.+)"
-
-        artistmatch = re.match(artistTagsStripping, track_name, flags=re.IGNORECASE)
+        artistmatch = ARTIST_TRACK_SPLIT_PATTERN.match(track_name)
         if artistmatch:
             artist_name = artistmatch.group(1).strip()
             track_name = artistmatch.group(3).strip()
     
     # remove unwanted extra characters
-    for pattern in FORBIDDEN_STRINGS:
-        track_name = re.sub(pattern, " ", track_name, flags=re.IGNORECASE|re.UNICODE).strip()
-        artist_name = re.sub(pattern, " ", artist_name, flags=re.IGNORECASE|re.UNICODE).strip()
+    track_name = remove_forbidden_strings(track_name)
+    artist_name = remove_forbidden_strings(artist_name)
 
     return track_name, artist_name
 
+def process_youtube_music_entry(entry: YTMWatchHistoryEntry, processed: YTMProcessedResults, ignore_videos=False) -> Optional[YTMProcessedTrack]:
+    """
+    Process a single YTM entry into a track.
+    Invalid / ignored entries are recorded in processed.errors / processed.skipped and None is returned
+    """
+    track = YTMProcessedTrack()
+
+    # Extract relevant fields
+    # Timestamp (ISO standard) + Unix timestamp
+    track.timestamp_iso = entry.time
+    track.timestamp_unix = convert_to_unix_timestamp(track.timestamp_iso)
+
+    # URL + decode (remove stuff like \u003d)
+    track.metadata.ytm_url = entry.titleUrl
+    if track.metadata.ytm_url:
+        track.metadata.ytm_url = track.metadata.ytm_url.encode().decode('unicode_escape')
+
+    # Artist
+    track.artist = entry.subtitles[0].name if entry.subtitles else None
+    track.metadata.original_channel = track.artist
+
+    # Title
+    track.title = entry.title[8:] # remove the "Watched " from the beginning
+    track.metadata.original_title = track.title
+
+    is_valid = track.artist and track.title
+    if not is_valid:
+        print_log(f"Skipping invalid entry (cannot identify track/artist): [{entry.title}][{track.metadata.ytm_url}]")
+        processed.errors.append(entry)
+        return None
+
+    # videos watched on YT Music are those not part of artist accounts (e.g. Artist - Topic format);
+    # if the flag to ignore them is true, then do not consider them
+    is_video = track.is_valid() and track.is_music_video()
+    if is_video and ignore_videos:
+        print_log(f"Ignoring video due to setting: [{entry.title}][{track.metadata.ytm_url}]")
+        processed.skipped.append(entry)
+        return None
+
+    if track.is_valid() and track.is_track():
+        track.artist = track.artist.replace(YT_MUSIC_TRACK_IDENTIFIER, "").strip()
+
+    # Cleanup track names which use YouTube video format (only applies to videos watched on YT music, standard music tracks do not need it)
+    if is_video and not ignore_videos:
+        track.title, track.artist = sanitize_video_track_info(track.title, track.artist)
+
+    track.metadata.is_video = is_video
+    return track
+
 def process_youtube_music_entries(input_file="watch-history.json", ignore_videos=False) -> YTMProcessedResults:
     """
     Read YTM input format, filter and process YTM entries, return formatted output object
@@ -71,55 +154,125 @@ def process_youtube_music_entries(input_file="watch-history.json", ignore_videos
             if not entry.is_youtube_music_entry():
                 continue
 
-            track = YTMProcessedTrack()
-
-            # Extract relevant fields
-            # Timestamp (ISO standard) + Unix timestamp
-            track.timestamp_iso = entry.time
-            track.timestamp_unix = convert_to_unix_timestamp(track.timestamp_iso)
-
-            # URL + decode (remove stuff like \u003d)
-            track.metadata.ytm_url = entry.titleUrl
-            if track.metadata.ytm_url:
-                track.metadata.ytm_url = track.metadata.ytm_url.encode().decode('unicode_escape')
+            track = process_youtube_music_entry(entry, processed, ignore_videos)
+            if not track:
+                continue
 
-            # Artist
-            track.artist = entry.subtitles[0].name if entry.subtitles else None
-            track.metadata.original_channel = track.artist
+            if track.metadata.is_video:
+                processed.music_videos.append(track)
+            else:
+                processed.songs.append(track)
 
-            # Title
-            track.title = entry.title[8:] # remove the "Watched " from the beginning
-            track.metadata.original_title = track.title
+        return processed
+    
+    except FileNotFoundError:
+        print_log(f"Error: {input_file} not found")
+        return []
+    except json.JSONDecodeError:
+        print_log(f"Error: Invalid JSON in {input_file}")
+        return []
 
-            is_valid = track.artist and track.title
-            if not is_valid:
-                print_log(f"Skipping invalid entry (cannot identify track/artist): [{entry.title}][{track.metadata.ytm_url}]")
-                processed.errors.append(entry)
-                continue
+def stream_youtube_music_entries(input_file="watch-history.json", ignore_videos=False, processed: YTMProcessedResults = None) -> Iterator[YTMProcessedTrack]:
+    """
+    Streaming variant of process_youtube_music_entries: reads the input array one item at a time,
+    drops non YouTube Music items before building any objects and yields the processed tracks.
+    Errors / skipped entries are collected into processed (if given), songs / music_videos are left to the caller.
 
-            # videos watched on YT Music are those not part of artist accounts (e.g. Artist - Topic format);
-            # if the flag to ignore them is true, then do not consider them
-            is_video = track.is_valid() and track.is_music_video()
-            if is_video and ignore_videos:
-                print_log(f"Ignoring video due to setting: [{entry.title}][{track.metadata.ytm_url}]")
-                processed.skipped.append(entry)
-                continue
+    Raises:
+        FileNotFoundError, json.JSONDecodeError: same conditions as process_youtube_music_entries
+    """
+    processed = processed or YTMProcessedResults(songs=[], music_videos=[], errors=[], skipped=[])
 
-            if track.is_valid() and track.is_track():
-                track.artist = track.artist.replace(YT_MUSIC_TRACK_IDENTIFIER, "").strip()
+    for item in iter_json_array(input_file):
+        if not isinstance(item, dict) or item.get("header") != YT_MUSIC_HEADER:
+            continue
 
-            # Cleanup track names which use YouTube video format (only applies to videos watched on YT music, standard music tracks do not need it)
-            if is_video and not ignore_videos:
-                track.title, track.artist = sanitize_video_track_info(track.title, track.artist)
+        track = process_youtube_music_entry(YTMWatchHistoryEntry.from_dict(item), processed, ignore_videos)
+        if track:
+            yield track
 
-            track.metadata.is_video = is_video
-            if is_video:
+def process_youtube_music_entries_streamed(input_file="watch-history.json", ignore_videos=False) -> YTMProcessedResults:
+    """
+    Same output as process_youtube_music_entries, built through stream_youtube_music_entries: the input file is never
+    loaded whole, only the kept tracks are (memory grows with the YouTube Music entries, not with the file size)
+    """
+    processed = YTMProcessedResults(songs=[], music_videos=[], errors=[], skipped=[])
+    try:
+        for track in stream_youtube_music_entries(input_file, ignore_videos, processed):
+            if track.metadata.is_video:
                 processed.music_videos.append(track)
             else:
                 processed.songs.append(track)
 
         return processed
-    
+
+    except FileNotFoundError:
+        print_log(f"Error: {input_file} not found")
+        return []
+    except json.JSONDecodeError:
+        print_log(f"Error: Invalid JSON in {input_file}")
+        return []
+
+def sanitize_watch_history_chunk(items: List[dict], ignore_videos=False) -> YTMProcessedResults:
+    """
+    Process a chunk of raw (already filtered) YTM items; worker function for process_youtube_music_entries_parallel
+    """
+    processed = YTMProcessedResults(songs=[], music_videos=[], errors=[], skipped=[])
+    for item in items:
+        track = process_youtube_music_entry(YTMWatchHistoryEntry.from_dict(item), processed, ignore_videos)
+        if not track:
+            continue
+
+        if track.metadata.is_video:
+            processed.music_videos.append(track)
+        else:
+            processed.songs.append(track)
+
+    return processed
+
+def iter_youtube_music_chunks(input_file: str, chunk_size: int) -> Iterator[List[dict]]:
+    """
+    Stream the input file and group the raw YouTube Music items into chunks of chunk_size
+    """
+    chunk = []
+    for item in iter_json_array(input_file):
+        if not isinstance(item, dict) or item.get("header") != YT_MUSIC_HEADER:
+            continue
+
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+def process_youtube_music_entries_parallel(input_file="watch-history.json", ignore_videos=False, workers=2, chunk_size=SANITIZER_CHUNK_SIZE) -> YTMProcessedResults:
+    """
+    Same output as process_youtube_music_entries, with the input split into chunks that are sanitized in a process pool.
+    Results are merged in the original order; at most 2 * workers chunks are in flight at any time
+    """
+    processed = YTMProcessedResults(songs=[], music_videos=[], errors=[], skipped=[])
+
+    def merge(part: YTMProcessedResults):
+        processed.songs.extend(part.songs)
+        processed.music_videos.extend(part.music_videos)
+        processed.errors.extend(part.errors)
+        processed.skipped.extend(part.skipped)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for chunk in iter_youtube_music_chunks(input_file, chunk_size):
+                pending.append(executor.submit(sanitize_watch_history_chunk, chunk, ignore_videos))
+                if len(pending) >= 2 * workers:
+                    merge(pending.popleft().result())
+
+            while pending:
+                merge(pending.popleft().result())
+
+        return processed
+
     except FileNotFoundError:
         print_log(f"Error: {input_file} not found")
         return []
@@ -127,18 +280,163 @@ def process_youtube_music_entries(input_file="watch-history.json", ignore_videos
         print_log(f"Error: Invalid JSON in {input_file}")
         return []
 
+def get_watermark_filename(account: str, pending: bool = False) -> str:
+    """
+    Watermark file of the account; the pending one is written by a --since-last-run execution and replaces
+    the current one only once the whole delta has been processed (see commit_watermark)
+    """
+    return generate_output_filename(account, "watermark.pending" if pending else "watermark", new_extension=".json", parent_directory="output\\watermarks")
+
+def read_watermark(account: str) -> Optional[HistoryWatermark]:
+    """
+    Read the watermark committed after the last --since-last-run execution for the account (None if there is none)
+    """
+    watermark_file = get_watermark_filename(account)
+    if not os.path.exists(watermark_file):
+        return None
+
+    try:
+        with open(watermark_file, 'r', encoding='utf-8') as file:
+            return HistoryWatermark.from_dict(json.load(file))
+    except json.JSONDecodeError:
+        print_log(f"Error: Invalid JSON in {watermark_file}, ignoring it")
+        return None
+
+def save_watermark(watermark: HistoryWatermark, account: str, pending: bool = False) -> Optional[str]:
+    """
+    Save the watermark of the processed history for the account
+    """
+    watermark_file = get_watermark_filename(account, pending)
+    try:
+        with open(watermark_file, 'w', encoding='utf-8') as output:
+            json.dump(watermark.to_dict(), output, indent=2, ensure_ascii=False)
+
+        print_log(f"Watermark written to: {watermark_file}")
+        return watermark_file
+
+    except Exception as e:
+        print_log(f"Error writing to {watermark_file}: {e}")
+        return None
+
+def commit_watermark(account: str) -> bool:
+    """
+    Make the pending watermark of the account the current one (the next --since-last-run starts after it).
+    Returns False if there is no pending watermark
+    """
+    pending_file = get_watermark_filename(account, pending=True)
+    if not os.path.exists(pending_file):
+        print_log(f"No pending watermark for account '{account}', nothing to commit")
+        return False
+
+    watermark_file = get_watermark_filename(account)
+    os.replace(pending_file, watermark_file)
+    print_log(f"Watermark committed to: {watermark_file}")
+    return True
+
+def process_youtube_music_entries_since(input_file="watch-history.json", ignore_videos=False, watermark: HistoryWatermark = None) -> tuple[YTMProcessedResults, HistoryWatermark]:
+    """
+    Process only the entries newer than the watermark (delta since the last run).
+    The Takeout export is newest-first, so reading stops at the first entry older than the watermark;
+    entries having exactly the watermark time are skipped if they were already processed (by hash).
+
+    Returns:
+        tuple: (processed delta, new watermark)
+    """
+    watermark = watermark or HistoryWatermark()
+    watermark_time = parse_iso_timestamp(watermark.time).timestamp() if watermark.time else None
+    known_hashes = set(watermark.entry_hashes)
+
+    new_watermark = HistoryWatermark(watermark.time, list(watermark.entry_hashes))
+    latest_time = watermark_time
+
+    processed = YTMProcessedResults(songs=[], music_videos=[], errors=[], skipped=[])
+    try:
+        for item in iter_json_array(input_file):
+            if not isinstance(item, dict) or item.get("header") != YT_MUSIC_HEADER:
+                continue
+
+            entry_hash = HistoryWatermark.hash_entry(item)
+            item_time = parse_iso_timestamp(item["time"]).timestamp() if item.get("time") else None
+
+            if watermark_time is not None and item_time is not None:
+                if item_time < watermark_time:
+                    print_log(f"Reached already processed entries at {item['time']}, stopping")
+                    break
+                if item_time == watermark_time and entry_hash in known_hashes:
+                    continue
+
+            # keep track of the newest entries for the next run
+            if item_time is not None:
+                if latest_time is None or item_time > latest_time:
+                    latest_time = item_time
+                    new_watermark = HistoryWatermark(item["time"], [entry_hash])
+                elif item_time == latest_time:
+                    new_watermark.entry_hashes.append(entry_hash)
+
+            track = process_youtube_music_entry(YTMWatchHistoryEntry.from_dict(item), processed, ignore_videos)
+            if not track:
+                continue
+
+            if track.metadata.is_video:
+                processed.music_videos.append(track)
+            else:
+                processed.songs.append(track)
+
+        return processed, new_watermark
+
+    except FileNotFoundError:
+        print_log(f"Error: {input_file} not found")
+        return [], watermark
+    except json.JSONDecodeError:
+        print_log(f"Error: Invalid JSON in {input_file}")
+        return [], watermark
+
 if __name__ == "__main__":
     # Arguments
     parser = argparse.ArgumentParser(description="Process YouTube Music history")
     parser.add_argument("--file", default="watch-history.json", help="Input file path (default: watch-history.json)")
     parser.add_argument("--ignore-videos", action="store_true", help="Specify in order to ignore videos watched on YouTube Music and process only songs")
+    parser.add_argument("--stream", action="store_true", help="Specify in order to read the input file incrementally (only the YouTube Music entries are kept in memory, for very big files); always the case with --since-last-run")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes to sanitize with (default: 1); the input is read incrementally when more than 1")
+    parser.add_argument("--since-last-run", action="store_true", help="Specify in order to process only the entries newer than the ones processed by the last --since-last-run execution")
+    parser.add_argument("--account", help="Account name used for the --since-last-run watermark (default: input file name)")
+    parser.add_argument("--delta-name", help="Name of the --since-last-run output files (default: input file name + run time)")
+    parser.add_argument("--commit-watermark", action="store_true", help="Specify in order to only commit the watermark of the last --since-last-run execution, once its entries have been converted and enriched")
     args = parser.parse_args()
+
+    if args.since_last_run and args.workers > 1:
+        parser.error("--workers cannot be used with --since-last-run (the delta is read in order and reading stops at the watermark)")
     
     input_file = args.file
     ignore_videos = args.ignore_videos
 
+    # Load environment variables
+    load_dotenv()
+
+    account = args.account or os.path.splitext(os.path.basename(input_file))[0]
+    if args.commit_watermark:
+        commit_watermark(account)
+        exit(0)
+
     # Process
-    ytm_entries = process_youtube_music_entries(input_file, ignore_videos)
+    new_watermark = None
+    output_name = input_file
+    if args.since_last_run:
+        # a previous delta that was not committed is processed again, under a new name
+        if os.path.exists(get_watermark_filename(account, pending=True)):
+            os.remove(get_watermark_filename(account, pending=True))
+        watermark = read_watermark(account)
+        if watermark:
+            print_log(f"Processing only entries newer than {watermark.time} (account '{account}')")
+        ytm_entries, new_watermark = process_youtube_music_entries_since(input_file, ignore_videos, watermark)
+        # the delta gets its own output files, the outputs of the previous runs are kept
+        output_name = f"{args.delta_name or get_delta_name(input_file)}.json"
+    elif args.workers > 1:
+        ytm_entries = process_youtube_music_entries_parallel(input_file, ignore_videos, args.workers)
+    elif args.stream:
+        ytm_entries = process_youtube_music_entries_streamed(input_file, ignore_videos)
+    else:
+        ytm_entries = process_youtube_music_entries(input_file, ignore_videos)
 
     # Post-process
     if not ytm_entries or len(ytm_entries.songs) + len(ytm_entries.music_videos) + len(ytm_entries.errors) == 0:
@@ -148,12 +446,21 @@ if __name__ == "__main__":
     # Print summary
     print_log(f"Found {len(ytm_entries.songs)} songs, {len(ytm_entries.music_videos)} music videos (skipped {len(ytm_entries.skipped)} entries)")
     print_log(f"Found {len(ytm_entries.errors)} errors")
+    cache_info = sanitize_video_track_info.cache_info()
+    if cache_info.hits + cache_info.misses > 0:
+        print_log(f"Video title sanitization cache: {cache_info.hits} hits, {cache_info.misses} misses ({cache_info.hits / (cache_info.hits + cache_info.misses):.1%} hit rate)")
 
     # Export to json
-    export_to_json(ytm_entries.songs, input_file, "songs")
-    export_to_json(ytm_entries.music_videos, input_file, "videos")
-    export_to_json(ytm_entries.errors, input_file, "errors", parent_directory="output\\errors")
-    export_to_json(ytm_entries.skipped, input_file, "skipped")
+    export_to_json(ytm_entries.songs, output_name, "songs", intermediate=True)
+    export_to_json(ytm_entries.music_videos, output_name, "videos")
+    export_to_json(ytm_entries.errors, output_name, "errors", parent_directory="output\\errors")
+    export_to_json(ytm_entries.skipped, output_name, "skipped")
+
+    # Save where this run stopped as pending: it becomes the start of the next --since-last-run once the delta
+    # has been converted and enriched (--commit-watermark, done by converter-aio.py at the end of the pipeline)
+    if new_watermark:
+        save_watermark(new_watermark, account, pending=True)
+        print_log(f"Once the delta is converted and enriched, run: python sanitizer.py --file {input_file} --commit-watermark" + (f" --account {args.account}" if args.account else ""))
 
     print_log("Processing complete. Songs and videos exported into separate files.")
     print_log("Double check the music videos file since the processing is not fully deterministic, everybody names their songs in various formats, some might be unsupported.")
@@ -0,0 +1,25 @@
+from typing import Dict, List
+
+from spotify.query_normalization import normalize_track_name
+from spotify.spotify_responses import TrackInfo
+
+
+class ArtistCatalog:
+    """
+    Tracks of one artist, for matching the searched titles locally instead of searching them one by one
+    """
+    def __init__(self, tracks: List[TrackInfo]):
+        self.tracks = tracks
+        self.tracks_by_name: Dict[str, List[TrackInfo]] = {}
+        for track in tracks:
+            self.tracks_by_name.setdefault(normalize_track_name(track.name), []).append(track)
+
+    def match(self, track_name: str, limit: int) -> List[TrackInfo]:
+        """
+        Tracks with the searched title (its versions from different albums / singles). They are not exact search matches:
+        the catalog artist is only known by name, so the matcher scores them like broad search results.
+        Empty if the title is not in the catalog: close titles are left to the search, since they are often
+        different songs ("Part 1" / "Part 2", "No. 5" / "No. 6")
+        """
+        return [TrackInfo(track.id, track.name, track.album_name, track.duration_ms, track.artist_name, exact_search_match=False)
+                for track in self.tracks_by_name.get(normalize_track_name(track_name), [])[:limit]]
@@ -1,4 +1,52 @@
-DEFAULT_MIN_INTERVAL_SECONDS = 0.1
+# Rate limiting (token bucket + AIMD, see utils/rate_limiter.py)
+DEFAULT_REQUESTS_PER_SECOND = 10.0
+DEFAULT_MIN_REQUESTS_PER_SECOND = 0.5
+DEFAULT_REQUESTS_BURST = 1.0
+DEFAULT_RATE_LIMIT_COOLDOWN_SECONDS = 30.0
 DEFAULT_BASE_BACKOFF_SECONDS = 1.0
 SPOTIFY_URI_PREFIX = "spotify:track:"
-SPOTIFY_SHADY_PARTS = ["feat.", "feat"]
+
+# Search query normalization (spotify/query_normalization.py)
+# words introducing a featured artist, removed with the credit from titles / artist names
+SPOTIFY_FEATURE_CREDIT_MARKERS = ["feat.", "feat", "ft.", "ft", "featuring"]
+# the only ones removed from titles outside brackets / " - " suffixes ("10 ft Tall" is a title)
+SPOTIFY_TITLE_FEATURE_CREDIT_MARKERS = ["feat.", "ft.", "featuring"]
+# version tags (in brackets or after " - ") that do not change the recording, removed from titles; other tags are kept as "(tag)"
+SPOTIFY_IGNORED_VERSION_TAGS = [
+    r"(?:\d{4} )?(?:digital(?:ly)? )?remaster(?:ed)?(?: version)?(?: \d{4})?",
+    r"official (?:music |lyrics? )?(?:video|audio)",
+    r"(?:official )?(?:lyrics?|lyric video|music video|video|audio|visuali[sz]er)",
+    r"hd|hq|4k|explicit|clean",
+]
+# version tags of other recordings, kept in the titles (in the same "(tag)" form for brackets / " - " suffixes)
+SPOTIFY_KEPT_VERSION_TAGS = [r"live\b.*", r"acoustic\b.*", r"unplugged\b.*", r".*\b(?:remix|mix|version|edit|cover)", r"instrumental", r"demo"]
+
+# Spotify-like export (Streaming_History_Audio_<years>_<index>.json files)
+SPOTIFY_EXPORT_FILE_PREFIX = "Streaming_History_Audio_"
+SPOTIFY_EXPORT_MAX_ENTRIES = 15000
+SPOTIFY_EXPORT_MAX_BYTES = 12 * 1024 * 1024
+SPOTIFY_EXPORT_SORT_RUN_SIZE = 100000
+SPOTIFY_EXPORT_MANIFEST_FILE = "export.manifest.json"  # files written by the last export into a directory (the only ones it replaces)
+
+# Persistent search cache (SQLite)
+DEFAULT_SEARCH_CACHE_FILE = "output\\cache\\spotify_search.sqlite"
+DEFAULT_SEARCH_CACHE_TTL_DAYS = 90
+DEFAULT_SEARCH_CACHE_NOT_FOUND_TTL_DAYS = 14
+DEFAULT_SEARCH_CACHE_MAX_MB = 256
+
+# Deferred retries of the searches that failed temporarily (network / server errors), at the end of the enrichment
+DEFERRED_RETRY_ROUNDS = 3
+DEFERRED_RETRY_PAUSE_SECONDS = 30
+
+# Artist catalog prefetch: the tracks of the artists with many distinct tracks in the history are matched locally
+SPOTIFY_ARTIST_SEARCH_LIMIT = 5
+SPOTIFY_ARTIST_PREFETCH_MAX_ALBUMS = 200
+SPOTIFY_ALBUMS_PAGE_SIZE = 50
+SPOTIFY_ALBUMS_BATCH_SIZE = 20
+
+# Local catalog (tracks found by previous enrichments / imported): minimum scores of a match used without searching
+LOCAL_CATALOG_MIN_TRACK_SCORE = 95
+LOCAL_CATALOG_MIN_ARTIST_SCORE = 90
+
+# Title clustering: minimum similarity of the titles (without version tags) of the same artist searched only once
+TITLE_CLUSTER_MIN_SCORE = 92
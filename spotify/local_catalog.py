@@ -0,0 +1,123 @@
+import glob
+import json
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+from rapidfuzz import fuzz, utils
+
+from spotify.constants import LOCAL_CATALOG_MIN_ARTIST_SCORE, LOCAL_CATALOG_MIN_TRACK_SCORE
+from spotify.query_normalization import normalize_artist_name, normalize_text, normalize_track_name
+from spotify.spotify_responses import TrackInfo
+from utils.entry_files import iter_entries
+from utils.simple_logger import print_log
+
+TOKEN_PATTERN = re.compile(r"\w+")
+DIGITS_PATTERN = re.compile(r"\d+")
+
+
+def track_from_dict(item: dict) -> Optional[TrackInfo]:
+    """
+    Catalog track from a TrackInfo dict (enrichment outputs) or a Spotify Web API track object (imported catalogs)
+    """
+    if "artists" in item:
+        return TrackInfo(
+            id=item.get("id", ""),
+            name=item.get("name", ""),
+            album_name=(item.get("album") or {}).get("name", ""),
+            duration_ms=item.get("duration_ms", 0),
+            artist_name=", ".join(artist["name"] for artist in item["artists"])
+        )
+    if "artist_name" in item:
+        return TrackInfo.from_dict(item)
+    return None
+
+
+class LocalCatalog:
+    """
+    Spotify tracks already known locally (found by previous enrichments, or imported), with an inverted index of
+    the words of their normalized titles and artists. Searches with a high confidence match in it need no API call
+    """
+    def __init__(self):
+        self.tracks: List[TrackInfo] = []
+        self.names: List[str] = []
+        self.artists: List[str] = []
+        self.ids: Set[str] = set()
+        self.title_index: Dict[str, Set[int]] = {}
+        self.artist_index: Dict[str, Set[int]] = {}
+
+    def add(self, track: TrackInfo) -> bool:
+        if not track.id or not track.name or track.id in self.ids:
+            return False
+
+        index = len(self.tracks)
+        self.ids.add(track.id)
+        self.tracks.append(track)
+        self.names.append(normalize_track_name(track.name))
+        self.artists.append(normalize_text(track.artist_name))
+        for token in TOKEN_PATTERN.findall(self.names[index]):
+            self.title_index.setdefault(token, set()).add(index)
+        for token in TOKEN_PATTERN.findall(self.artists[index]):
+            self.artist_index.setdefault(token, set()).add(index)
+        return True
+
+    def add_file(self, input_file: str) -> int:
+        """
+        Add the tracks of an entries file (the found tracks in their metadata) or of a catalog file
+        (TrackInfo dicts / Spotify track objects); returns the number of new tracks
+        """
+        added = 0
+        try:
+            for item in iter_entries(input_file):
+                if not isinstance(item, dict):
+                    continue
+                items = (item.get("metadata") or {}).get("tracks", []) if "metadata" in item else [item]
+                for track in filter(None, map(track_from_dict, items)):
+                    added += self.add(track)
+        except FileNotFoundError:
+            print_log(f"Error: {input_file} not found")
+        except json.JSONDecodeError:
+            print_log(f"Error: Invalid JSON in {input_file}")
+        return added
+
+    def match(self, track_name: str, artist_name: str, limit: int) -> List[TrackInfo]:
+        """
+        Catalog tracks matching a search with high confidence, best first: title similarity of at least
+        LOCAL_CATALOG_MIN_TRACK_SCORE with the same numbers in it, artist similarity of at least LOCAL_CATALOG_MIN_ARTIST_SCORE.
+        Empty if there is none (the search has to call the API)
+        """
+        name = normalize_track_name(track_name)
+        artist = normalize_artist_name(artist_name)
+        if not name or not artist:
+            return []
+
+        # candidates share at least one word of the title and one of the artist
+        title_candidates = set().union(*(self.title_index.get(token, ()) for token in TOKEN_PATTERN.findall(name)))
+        artist_candidates = set().union(*(self.artist_index.get(token, ()) for token in TOKEN_PATTERN.findall(artist)))
+
+        digits = DIGITS_PATTERN.findall(name)
+        matches = []
+        for index in title_candidates & artist_candidates:
+            track_score = fuzz.ratio(name, self.names[index], processor=utils.default_process)
+            if track_score < LOCAL_CATALOG_MIN_TRACK_SCORE or DIGITS_PATTERN.findall(self.names[index]) != digits:
+                continue
+            artist_score = fuzz.token_set_ratio(artist, self.artists[index], processor=utils.default_process)
+            if artist_score >= LOCAL_CATALOG_MIN_ARTIST_SCORE:
+                matches.append((track_score + artist_score, index))
+
+        matches.sort(key=lambda match: (-match[0], match[1]))
+        return [self._copy(self.tracks[index]) for _, index in matches[:limit]]
+
+    @staticmethod
+    def _copy(track: TrackInfo) -> TrackInfo:
+        # not an API search result: scored by the matcher like a broad search result
+        return TrackInfo(track.id, track.name, track.album_name, track.duration_ms, track.artist_name, exact_search_match=False)
+
+    @classmethod
+    def from_files(cls, patterns: Iterable[str]) -> "LocalCatalog":
+        catalog = cls()
+        for pattern in patterns:
+            # patterns without matches are skipped (e.g. no previous outputs yet), missing plain files are reported
+            input_files = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+            for input_file in input_files:
+                catalog.add_file(input_file)
+        return catalog
@@ -0,0 +1,108 @@
+import re
+import unicodedata
+from typing import Tuple
+
+from spotify.constants import (SPOTIFY_FEATURE_CREDIT_MARKERS, SPOTIFY_IGNORED_VERSION_TAGS, SPOTIFY_KEPT_VERSION_TAGS,
+                               SPOTIFY_TITLE_FEATURE_CREDIT_MARKERS)
+
+# characters NFKC keeps but the search treats like their plain forms
+CHARACTER_REPLACEMENTS = str.maketrans({"‘": "'", "’": "'", "‚": "'", "“": "", "”": "", "„": "", '"': "", "–": "-", "—": "-", "‐": "-"})
+TRAILING_PUNCTUATION = " .,;:!?-~*"
+
+FEATURE_CREDIT_PATTERN = "|".join(re.escape(marker) for marker in sorted(SPOTIFY_FEATURE_CREDIT_MARKERS, key=len, reverse=True))
+FEATURE_CREDIT_SUFFIX = re.compile(rf"\s(?:{FEATURE_CREDIT_PATTERN})\s+\S.*$")
+FEATURE_CREDIT_TAG = re.compile(rf"^(?:{FEATURE_CREDIT_PATTERN})(?=\s|$)")
+# credit after the main title, up to the version tags: the word before the marker, the marker
+TITLE_FEATURE_CREDIT_PATTERN = "|".join(re.escape(marker) for marker in sorted(SPOTIFY_TITLE_FEATURE_CREDIT_MARKERS, key=len, reverse=True))
+TITLE_FEATURE_CREDIT_SUFFIX = re.compile(rf"(\S+)\s({TITLE_FEATURE_CREDIT_PATTERN})\s+[^\s()][^()]*?(?=\s*\(|$)")
+# "ft." after a number is a length ("thirteen ft. under")
+NUMBER_WORD = re.compile(r"\d+(?:[.,]\d+)?|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|(?:thir|four|fif|six|seven|eigh|nine)teen"
+                         r"|twenty|thirty|forty|fifty|sixty|seventy|eighty|ninety|hundred|thousand|million")
+IGNORED_VERSION_TAG = re.compile(rf"^(?:{'|'.join(SPOTIFY_IGNORED_VERSION_TAGS)})$")
+KEPT_VERSION_TAG = re.compile(rf"^(?:{'|'.join(SPOTIFY_KEPT_VERSION_TAGS)})$")
+BRACKETED_TAG = re.compile(r"\s*[(\[]([^()\[\]]*)[)\]]")
+DASH_SUFFIX = re.compile(r"\s+-\s+([^-]+)$")
+
+
+def strip_latin_diacritics(text: str) -> str:
+    # only the accents of latin letters: the marks of other scripts (e.g. Japanese dakuten) change the character
+    decomposed = unicodedata.normalize("NFKD", text)
+    output = []
+    for char in decomposed:
+        if unicodedata.combining(char) and output and ord(output[-1]) < 0x250:
+            continue
+        output.append(char)
+    return unicodedata.normalize("NFC", "".join(output))
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form of a search term: Unicode NFKC (full-width characters...), case folded, no accents on latin
+    letters, plain quotes / dashes, single spaces and no trailing punctuation.
+    A text made only of punctuation (e.g. "...") is kept: without punctuation, then without quotes, then as it is
+    """
+    normalized = unicodedata.normalize("NFKC", text or "").casefold()
+    normalized = " ".join(strip_latin_diacritics(normalized).translate(CHARACTER_REPLACEMENTS).split())
+    return normalized.rstrip(TRAILING_PUNCTUATION) or normalized or " ".join((text or "").split())
+
+
+def normalize_version_tag(tag: str) -> str:
+    """
+    Replacement of a bracketed / " - " suffixed tag: removed for feature credits and tags of the same recording
+    (remasters, official video...), "(tag)" for the ones of other recordings; None if it is not a version tag
+    """
+    tag = tag.strip()
+    if not tag or FEATURE_CREDIT_TAG.match(tag) or IGNORED_VERSION_TAG.match(tag):
+        return ""
+    if KEPT_VERSION_TAG.match(tag):
+        return f" ({tag})"
+    return None
+
+
+def strip_title_feature_credit(text: str) -> str:
+    """
+    Remove a "feat." / "ft." / "featuring" credit following the main title (bare "ft" / "feat" are left, they are words too)
+    """
+    match = TITLE_FEATURE_CREDIT_SUFFIX.search(text)
+    while match and match.group(2).startswith("ft") and NUMBER_WORD.fullmatch(match.group(1)):
+        match = TITLE_FEATURE_CREDIT_SUFFIX.search(text, match.end(2))
+    return text[:match.end(1)] + text[match.end():] if match else text
+
+
+def normalize_track_name(track_name: str) -> str:
+    """
+    Canonical track title: normalize_text, without feature credits (in brackets, after " - ", or a "feat." / "ft." / "featuring"
+    suffix) nor tags that do not change the recording,
+    other version tags in the same "(tag)" form whether they were in brackets or after " - "
+    """
+    text = normalize_text(track_name)
+
+    def replace_bracketed_tag(match: re.Match) -> str:
+        replacement = normalize_version_tag(match.group(1))
+        return f" ({match.group(1).strip()})" if replacement is None else replacement
+
+    text = BRACKETED_TAG.sub(replace_bracketed_tag, text)
+
+    # " - tag" suffix ("Song - Remastered 2011", "Song - Live"), other suffixes are part of the title
+    match = DASH_SUFFIX.search(text)
+    if match:
+        replacement = normalize_version_tag(match.group(1))
+        if replacement is not None:
+            text = text[:match.start()] + replacement
+
+    text = strip_title_feature_credit(text)
+    # a title made only of tags stays as it is
+    return " ".join(text.split()).rstrip(TRAILING_PUNCTUATION) or normalize_text(track_name)
+
+
+def normalize_artist_name(artist_name: str) -> str:
+    """
+    Canonical artist name: normalize_text, without the featured artists
+    """
+    text = BRACKETED_TAG.sub(lambda match: "" if FEATURE_CREDIT_TAG.match(match.group(1).strip()) else match.group(0), normalize_text(artist_name))
+    text = FEATURE_CREDIT_SUFFIX.sub("", text)
+    return " ".join(text.split()).rstrip(TRAILING_PUNCTUATION) or normalize_text(artist_name)
+
+
+def normalize_search_terms(track_name: str, artist_name: str) -> Tuple[str, str]:
+    return normalize_track_name(track_name), normalize_artist_name(artist_name)
@@ -0,0 +1,113 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from spotify.query_normalization import normalize_text
+from spotify.spotify_responses import TrackInfo
+from utils.simple_logger import print_log
+
+# Stored value of a search without results
+NOT_FOUND_VALUE = "[]"
+
+
+class SpotifySearchCache:
+    """
+    Persistent cache of Spotify track searches (SQLite, WAL mode: several processes can read and write it at once).
+    Entries are keyed on the normalized query (spotify/query_normalization.py) + market + result limit, expire after
+    ttl_seconds and the least recently used ones are evicted once the stored results exceed max_bytes.
+    Searches without results (negative cache) have their own, usually shorter, not_found_ttl_seconds
+    """
+    def __init__(self, cache_file: str, ttl_seconds: float, max_bytes: int, not_found_ttl_seconds: Optional[float] = None):
+        directory = os.path.dirname(cache_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.cache_file = cache_file
+        self.ttl_seconds = ttl_seconds
+        self.not_found_ttl_seconds = ttl_seconds if not_found_ttl_seconds is None else not_found_ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        # one connection shared by the client threads, serialized by the lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(cache_file, timeout=30, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS search_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS search_cache_accessed_at ON search_cache (accessed_at)")
+        self.evict()
+
+    @staticmethod
+    def get_key(track_name: str, artist_name: str, market: str, limit: int) -> str:
+        return f"{normalize_text(market)}|{limit}|{normalize_text(track_name)}|{normalize_text(artist_name)}"
+
+    def get(self, key: str) -> Optional[List[TrackInfo]]:
+        """
+        Cached search result (an empty list is a cached "no results"), None if not cached or expired
+        """
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute("SELECT value, created_at FROM search_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > (self.not_found_ttl_seconds if row[0] == NOT_FOUND_VALUE else self.ttl_seconds):
+                self.misses += 1
+                return None
+
+            self.connection.execute("UPDATE search_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+
+        return [TrackInfo.from_dict(track) for track in json.loads(row[0])]
+
+    def put(self, key: str, tracks: List[TrackInfo]):
+        # only the search result is stored, the match scores are computed for every entry later
+        value = json.dumps([{field: value for field, value in track.to_dict().items() if field != "match_score"} for track in tracks],
+                           ensure_ascii=False, separators=(",", ":"))
+        now = time.time()
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO search_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                                    (key, value, len(value.encode('utf-8')), now, now))
+
+    def evict(self) -> int:
+        """
+        Remove the expired entries, then the least recently used ones until the cache fits in max_bytes.
+        Returns the number of removed entries
+        """
+        with self.lock:
+            now = time.time()
+            removed = self.connection.execute("DELETE FROM search_cache WHERE created_at < ? OR (value = ? AND created_at < ?)",
+                                              (now - self.ttl_seconds, NOT_FOUND_VALUE, now - self.not_found_ttl_seconds)).rowcount
+
+            stored_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM search_cache").fetchone()[0]
+            if stored_bytes > self.max_bytes:
+                cursor = self.connection.execute("SELECT key, size FROM search_cache ORDER BY accessed_at")
+                keys = []
+                for key, size in cursor:
+                    if stored_bytes <= self.max_bytes:
+                        break
+                    keys.append((key,))
+                    stored_bytes -= size
+                cursor.close()
+                self.connection.executemany("DELETE FROM search_cache WHERE key = ?", keys)
+                removed += len(keys)
+
+        return removed
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            entries, stored_bytes = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM search_cache").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "stored_bytes": stored_bytes}
+
+    def log_stats(self):
+        stats = self.get_stats()
+        print_log(f"Search cache ({self.cache_file}): {stats['hits']} hits, {stats['misses']} misses, "
+                  f"{stats['entries']} entries stored ({stats['stored_bytes'] / (1024 * 1024):.1f} MB)")
+
+    def close(self):
+        self.evict()
+        with self.lock:
+            self.connection.close()
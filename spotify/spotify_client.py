@@ -1,18 +1,49 @@
-import random
-import time
-from typing import List
-from spotify.constants import DEFAULT_BASE_BACKOFF_SECONDS, DEFAULT_MIN_INTERVAL_SECONDS
+from typing import List, Optional
+from spotify.constants import (DEFAULT_BASE_BACKOFF_SECONDS, DEFAULT_REQUESTS_PER_SECOND, SPOTIFY_ALBUMS_BATCH_SIZE, SPOTIFY_ALBUMS_PAGE_SIZE,
+                               SPOTIFY_ARTIST_PREFETCH_MAX_ALBUMS, SPOTIFY_ARTIST_SEARCH_LIMIT)
+import requests
 import spotipy
+from spotipy.cache_handler import CacheHandler
 from spotipy.oauth2 import SpotifyClientCredentials
 from spotipy.exceptions import SpotifyException
+from spotify.query_normalization import normalize_artist_name, normalize_search_terms
+from spotify.search_cache import SpotifySearchCache
 from spotify.spotify_responses import TrackInfo
+from utils.api_cassette import ApiCassette
+from utils.rate_limiter import RateLimiter
 from utils.simple_logger import print_log
 
+class SearchError(Exception):
+    """
+    Failed Spotify search (a search without results is not an error, it returns an empty list)
+    """
+
+class TransientSearchError(SearchError):
+    """
+    Temporary failure (server errors, network problems, rate limiting retries exhausted): worth retrying later
+    """
+
+class FatalSearchError(SearchError):
+    """
+    Failure that would happen again for the same search (bad request, authentication, unexpected errors)
+    """
+
 class SpotifyClient:
-    def __init__(self, client_id: str, client_secret: str, market: str, search_results_limit: int, max_retries: int):
+    def __init__(self, client_id: str, client_secret: str, market: str, search_results_limit: int, max_retries: int,
+                 search_cache: Optional[SpotifySearchCache] = None, rate_limiter: Optional[RateLimiter] = None,
+                 api_url: Optional[str] = None, auth_url: Optional[str] = None, cassette: Optional[ApiCassette] = None,
+                 token_cache_handler: Optional[CacheHandler] = None):
         """
-        Initialize Spotify API client
+        Initialize Spotify API client (search_cache: optional persistent cache, shared between runs;
+        rate_limiter: request rate control, shared by all the threads using the client;
+        api_url / auth_url: other Web API / token endpoints, e.g. a local stand-in server;
+        cassette: records the search responses, or replays them without credentials / network;
+        token_cache_handler: where the access token is kept, spotipy's .cache file by default)
         """
+        if cassette and cassette.is_replaying():
+            client_id = client_id or "replay"
+            client_secret = client_secret or "replay"
+
         if not client_id or not client_secret or not market:
             print_log("Error: SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET, and CONN_COUNTRY must be set in .env file")
             print_log("Get your credentials from: https://developer.spotify.com/dashboard/applications")
@@ -20,67 +51,63 @@ class SpotifyClient:
         
         client_credentials_manager = SpotifyClientCredentials(
             client_id=client_id,
-            client_secret=client_secret
+            client_secret=client_secret,
+            cache_handler=token_cache_handler
         )
 
-        self.spotify = spotipy.Spotify(client_credentials_manager=client_credentials_manager)
+        if auth_url:
+            client_credentials_manager.OAUTH_TOKEN_URL = auth_url
+
+        # plain session: spotipy's own one retries the 429 / 5xx answers inside urllib3, behind the rate limiter's back
+        # (and with retries disabled it reports the 5xx as 429 without their Retry-After)
+        self.spotify = spotipy.Spotify(client_credentials_manager=client_credentials_manager, requests_session=requests.Session())
+        if api_url:
+            self.spotify.prefix = api_url if api_url.endswith("/") else f"{api_url}/"
+        self.cassette = cassette
+        self.search_request = self._get_request_func("search")
+        self.artist_albums_request = self._get_request_func("artist_albums")
+        self.albums_request = self._get_request_func("albums")
+        self.album_tracks_request = self._get_request_func("album_tracks")
         self.market = market
         self.search_results_limit = search_results_limit
 
         # Local cache to avoid duplicate API calls
         self.cache = {}
+        self.search_cache = search_cache
 
-        # Rate limiting variables
-        self.last_request_time = 0
-        self.min_request_interval = DEFAULT_MIN_INTERVAL_SECONDS  # Start with 100ms between requests
+        # Rate limiting
+        self.rate_limiter = rate_limiter or RateLimiter(DEFAULT_REQUESTS_PER_SECOND, base_backoff=DEFAULT_BASE_BACKOFF_SECONDS)
         self.max_retries = max_retries
-        self.base_backoff = DEFAULT_BASE_BACKOFF_SECONDS  # Base backoff time in seconds
 
-    def _adaptive_delay(self):
-        """
-        Implement adaptive delay between requests
-        """
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        if time_since_last < self.min_request_interval:
-            sleep_time = self.min_request_interval - time_since_last
-            time.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
+    def _get_request_func(self, name: str):
+        # API call of the spotipy client, recorded / replayed by the cassette if any
+        request_func = getattr(self.spotify, name)
+        return self.cassette.wrap(f"spotify.{name}", request_func) if self.cassette else request_func
 
-    def _handle_rate_limit(self, retry_after: int = None, attempt: int = 0):
+    def _handle_rate_limit(self, retry_after: int = None, attempt: int = 0, sent_at: Optional[float] = None):
         """
-        Handle rate limiting with exponential backoff
+        Handle rate limiting: the limiter slows down and pauses all the threads (the retry waits for it)
         """
+        sleep_time = self.rate_limiter.on_rate_limited(retry_after, attempt, sent_at)
         if retry_after:
-            # Use the Retry-After header if provided
-            sleep_time = retry_after + random.uniform(0.1, 0.5)  # Add small jitter
             print_log(f"Rate limited. Waiting Spotify's recommended {sleep_time:.1f} seconds...")
         else:
-            # Exponential backoff with jitter
-            sleep_time = (self.base_backoff * (2 ** attempt)) + random.uniform(0.1, 1.0)
             print_log(f"Rate limited. Backing off for {sleep_time:.1f} seconds...")
 
-        time.sleep(sleep_time)
-        
-        # Increase minimum interval to be more conservative
-        self.min_request_interval = min(self.min_request_interval * 1.5, 2.0)
-
     def _make_spotify_request(self, request_func, *args, **kwargs):
         """
         Make a Spotify API request with rate limiting and retry logic
         """
         for attempt in range(self.max_retries):
             try:
-                # Apply adaptive delay
-                self._adaptive_delay()
+                # Wait for a request slot
+                sent_at = self.rate_limiter.acquire()
                 
                 # Make the request
                 result = request_func(*args, **kwargs)
                 
-                # If successful, gradually reduce the request interval
-                self.min_request_interval = max(self.min_request_interval * 0.95, 0.1)
+                # If successful, gradually increase the request rate
+                self.rate_limiter.on_success()
 
                 return result
                 
@@ -92,17 +119,23 @@ class SpotifyClient:
                         if hasattr(e, 'headers') and 'Retry-After' in e.headers:
                             retry_after = int(e.headers['Retry-After'])
                         
-                        self._handle_rate_limit(retry_after, attempt)
+                        self._handle_rate_limit(retry_after, attempt, sent_at)
                         continue
                     else:
                         print_log(f"Max retries exceeded for rate limiting")
-                        raise Exception(f"Max retries ({self.max_retries}) exceeded due to rate limiting")
+                        raise TransientSearchError(f"Max retries ({self.max_retries}) exceeded due to rate limiting")
+                elif e.http_status >= 500:
+                    print_log(f"Spotify API server error: {e}")
+                    raise TransientSearchError(f"Spotify API server error {e.http_status}") from e
                 else:
                     print_log(f"Unknown Spotify API error: {e}")
-                    raise e
+                    raise FatalSearchError(f"Spotify API error {e.http_status}: {e.msg}") from e
+            except requests.exceptions.RequestException as e:
+                print_log(f"Network error: {e}")
+                raise TransientSearchError(f"Network error: {e}") from e
             except Exception as e:
                 print_log(f"Unexpected error: {e} (will not retry!)")
-                raise e
+                raise FatalSearchError(f"Unexpected error: {e}") from e
         
         return None
     
@@ -112,14 +145,29 @@ class SpotifyClient:
         First tries to search by exact artist and track match. 
         If the API returns a result, it marks the resulted tracks as exact_search_match and returns them.
         In this case it is kindof safe to use the first result.
-        Otherwise it falls back to a broader search and  returns the first search_results_limit results
+        Otherwise it falls back to a broader search and  returns the first search_results_limit results.
+        Raises TransientSearchError (can be retried later) or FatalSearchError (remembered for the key) on failures
         """
+        # Same canonical terms for the cache keys and the queries (cosmetic differences share one search)
+        track_name, artist_name = normalize_search_terms(track_name, artist_name)
+
         # Create cache key
         cache_key = f"{track_name}||{artist_name}"
 
-        # Check cache first
+        # Check cache first (results, or the error of a search that cannot succeed)
         if cache_key in self.cache:
-            return self.cache[cache_key]
+            cached = self.cache[cache_key]
+            if isinstance(cached, FatalSearchError):
+                raise cached
+            return cached
+
+        # Then the persistent cache (previous runs)
+        if self.search_cache:
+            persistent_key = SpotifySearchCache.get_key(track_name, artist_name, self.market, self.search_results_limit)
+            tracks = self.search_cache.get(persistent_key)
+            if tracks is not None:
+                self.cache[cache_key] = tracks
+                return tracks
         
         try:
             # Clean search query
@@ -127,7 +175,7 @@ class SpotifyClient:
             
             # Search on Spotify with rate limiting
             results = self._make_spotify_request(
-                self.spotify.search, 
+                self.search_request, 
                 q=query, 
                 type='track', 
                 limit=self.search_results_limit,
@@ -143,7 +191,7 @@ class SpotifyClient:
                 # Try a broader search if exact match fails (with rate limiting)
                 query = f"{artist_name} {track_name}"
                 results = self._make_spotify_request(
-                    self.spotify.search,
+                    self.search_request,
                     q=query,
                     type='track',
                     limit=self.search_results_limit,
@@ -166,10 +214,109 @@ class SpotifyClient:
                 
             # Cache the result
             self.cache[cache_key] = tracks
+            if self.search_cache:
+                self.search_cache.put(persistent_key, tracks)
             return tracks
 
+        except TransientSearchError as e:
+            print_log(f"Error searching for track '{track_name}' by '{artist_name}': {e} (can be retried later)")
+            raise e # not cached, the search can be retried
         except Exception as e:
             print_log(f"Error searching for track '{track_name}' by '{artist_name}': {e}")
-            # Cache negative result to avoid retrying
-            self.cache[cache_key] = None
-            raise e # raise to propagate error
+            # Cache the error to avoid retrying
+            error = e if isinstance(e, FatalSearchError) else FatalSearchError(str(e))
+            self.cache[cache_key] = error
+            raise error # raise to propagate error
+
+    def is_search_cached(self, track_name: str, artist_name: str) -> bool:
+        """
+        True if search_track has the result without calling the API (memory or persistent cache)
+        """
+        track_name, artist_name = normalize_search_terms(track_name, artist_name)
+        cache_key = f"{track_name}||{artist_name}"
+        if cache_key in self.cache:
+            return True
+
+        if self.search_cache:
+            tracks = self.search_cache.get(SpotifySearchCache.get_key(track_name, artist_name, self.market, self.search_results_limit))
+            if tracks is not None:
+                self.cache[cache_key] = tracks
+                return True
+        return False
+
+    def remember_search(self, track_name: str, artist_name: str, tracks: List[TrackInfo], persistent: bool = True):
+        """
+        Store a search result found without searching (e.g. in an artist catalog), so that search_track returns it
+        (persistent: also in the search cache, for the next runs)
+        """
+        track_name, artist_name = normalize_search_terms(track_name, artist_name)
+        self.cache[f"{track_name}||{artist_name}"] = tracks
+        if persistent and self.search_cache:
+            self.search_cache.put(SpotifySearchCache.get_key(track_name, artist_name, self.market, self.search_results_limit), tracks)
+
+    def get_artist_catalog(self, artist_name: str) -> List[TrackInfo]:
+        """
+        All the tracks of the albums and singles of an artist, with a few paginated calls: the artist search, its albums
+        (50 per page) and their tracks (20 albums per call). Empty if no artist has exactly this name, or if several do
+        (homonyms cannot be told apart by name, their tracks are searched one by one).
+        Raises TransientSearchError / FatalSearchError like the searches
+        """
+        results = self._make_spotify_request(
+            self.search_request,
+            q=f'artist:"{artist_name}"',
+            type='artist',
+            limit=SPOTIFY_ARTIST_SEARCH_LIMIT,
+            market=self.market
+        )
+        artists = [artist for artist in results['artists']['items']
+                   if normalize_artist_name(artist['name']) == normalize_artist_name(artist_name)]
+        if len(artists) != 1:
+            if artists:
+                print_log(f"{len(artists)} artists named '{artist_name}', not prefetching their catalog")
+            return []
+        artist = artists[0]
+
+        album_ids = []
+        while len(album_ids) < SPOTIFY_ARTIST_PREFETCH_MAX_ALBUMS:
+            page = self._make_spotify_request(
+                self.artist_albums_request,
+                artist['id'],
+                include_groups='album,single',
+                country=self.market,
+                limit=SPOTIFY_ALBUMS_PAGE_SIZE,
+                offset=len(album_ids)
+            )
+            album_ids.extend(album['id'] for album in page['items'])
+            if not page['next'] or not page['items']:
+                break
+
+        tracks = []
+        for start in range(0, len(album_ids), SPOTIFY_ALBUMS_BATCH_SIZE):
+            results = self._make_spotify_request(self.albums_request, album_ids[start:start + SPOTIFY_ALBUMS_BATCH_SIZE], market=self.market)
+            for album in results['albums']:
+                if not album:
+                    continue
+
+                # the album object has the first page of its tracks only
+                tracks_raw = list(album['tracks']['items'])
+                while len(tracks_raw) < album['tracks']['total']:
+                    page = self._make_spotify_request(
+                        self.album_tracks_request,
+                        album['id'],
+                        limit=SPOTIFY_ALBUMS_PAGE_SIZE,
+                        offset=len(tracks_raw),
+                        market=self.market
+                    )
+                    if not page['items']:
+                        break
+                    tracks_raw.extend(page['items'])
+
+                tracks.extend(TrackInfo(
+                    id=track['id'],
+                    name=track['name'],
+                    album_name=album['name'],
+                    duration_ms=track['duration_ms'],
+                    artist_name=", ".join(track_artist['name'] for track_artist in track['artists']) if track['artists'] else artist['name']
+                ) for track in tracks_raw)
+
+        return tracks
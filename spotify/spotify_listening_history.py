@@ -4,6 +4,8 @@ from spotify.constants import SPOTIFY_URI_PREFIX
 
 
 class SpotifyAdditionalYTMData:
+    __slots__ = ("ms_played", "conn_country", "platform", "ip_addr")
+
     def __init__(self, ms_played: int = 0, conn_country: str = "", platform: str = "", ip_addr: str = ""):
         self.ms_played = ms_played
         self.conn_country = conn_country
@@ -19,6 +21,12 @@ class SpotifyAdditionalYTMData:
         }
 
 class SpotifyStreamingEntry:
+    __slots__ = ("ts", "master_metadata_track_name", "master_metadata_album_artist_name", "ms_played",
+                 "platform", "conn_country", "ip_addr", "spotify_track_uri", "master_metadata_album_album_name",
+                 "reason_start", "reason_end", "skipped", "offline", "offline_timestamp", "incognito_mode",
+                 "episode_name", "episode_show_name", "spotify_episode_uri", "audiobook_title", "audiobook_uri",
+                 "audiobook_chapter_uri", "audiobook_chapter_title", "shuffle", "metadata")
+
     def __init__(self, ts: str = "",
                  master_metadata_track_name: str = "", master_metadata_album_artist_name: str = "", 
                  additional_data: SpotifyAdditionalYTMData = None):
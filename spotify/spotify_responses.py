@@ -3,6 +3,8 @@ from spotify.constants import SPOTIFY_URI_PREFIX
 
 
 class TrackInfo:
+    __slots__ = ("id", "name", "album_name", "duration_ms", "artist_name", "uri", "exact_search_match", "match_score")
+
     def __init__(self, id: str, name: str, album_name: str, duration_ms: int, artist_name: str, exact_search_match: bool = False, match_score: MatchScore = None):
         self.id = id
         self.name = name
@@ -13,6 +15,11 @@ class TrackInfo:
         self.exact_search_match = exact_search_match
         self.match_score = match_score or MatchScore()
 
+    def copy(self, exact_search_match: bool = None):
+        # same track, score not computed yet
+        exact_search_match = self.exact_search_match if exact_search_match is None else exact_search_match
+        return TrackInfo(self.id, self.name, self.album_name, self.duration_ms, self.artist_name, exact_search_match)
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -0,0 +1,257 @@
+import sys
+from array import array
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from objects.process_metadata import SpotifyProcessingMetadata
+from objects.ytm_processed_track import YTMProcessedTrack
+from spotify.spotify_listening_history import SpotifyAdditionalYTMData, SpotifyStreamingEntry
+from spotify.spotify_responses import TrackInfo
+from utils.timestamps import MISSING_TIMESTAMP, convert_to_unix_timestamp
+
+# Per-row fields of the entries / metadata, stored as dictionary-encoded columns
+ENTRY_FIELDS = [field for field in SpotifyStreamingEntry.__slots__ if field not in ("ts", "metadata")]
+METADATA_FIELDS = [field for field in SpotifyProcessingMetadata.__slots__ if field != "tracks"]
+
+
+class DictionaryColumn:
+    """
+    Dictionary-encoded column: every distinct value is stored (and interned, for strings) once, rows hold its code.
+    While all the rows have the same value (e.g. env-derived fields) no codes are stored at all
+    """
+    __slots__ = ("values", "index", "codes", "length")
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+        self.codes: Optional[array] = None
+        self.length = 0
+
+    def _encode(self, value) -> int:
+        if isinstance(value, str):
+            value = sys.intern(value)
+
+        # the type is part of the key, otherwise 1 / 1.0 / True (or 0 / False) would share a code
+        key = (type(value), value)
+        code = self.index.get(key)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.index[key] = code
+
+        # first row with a different value: switch from "constant" to coded rows
+        if code != 0 and self.codes is None:
+            self.codes = array('I', [0]) * self.length
+        return code
+
+    def append(self, value):
+        code = self._encode(value)
+        if self.codes is not None:
+            self.codes.append(code)
+        self.length += 1
+
+    def __setitem__(self, i: int, value):
+        code = self._encode(value)
+        if self.codes is not None:
+            self.codes[i] = code
+
+    def __getitem__(self, i: int):
+        if self.codes is None:
+            if not -self.length <= i < self.length:
+                raise IndexError("column index out of range")
+            return self.values[0]
+        return self.values[self.codes[i]]
+
+    def __len__(self):
+        return self.length
+
+
+class TimestampColumn:
+    """
+    ISO timestamps stored as unix milliseconds (int64 array); values that do not round-trip exactly
+    through the Takeout shape YYYY-MM-DDTHH:MM:SS.fffZ (missing ones included) are kept aside as they are,
+    with MISSING_TIMESTAMP in the array
+    """
+    __slots__ = ("millis", "exceptions")
+
+    def __init__(self):
+        self.millis = array('q')
+        self.exceptions = {}
+
+    @staticmethod
+    def format(millis: int) -> str:
+        seconds, fraction = divmod(millis, 1000)
+        return datetime.fromtimestamp(seconds, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S") + f".{fraction:03d}Z"
+
+    @classmethod
+    def parse(cls, iso_timestamp: str) -> Optional[int]:
+        """
+        Milliseconds for a Takeout-shaped timestamp, None if it would not round-trip exactly
+        """
+        if not iso_timestamp or len(iso_timestamp) != 24 or iso_timestamp[19] != '.' or iso_timestamp[-1] != 'Z':
+            return None
+        try:
+            millis = convert_to_unix_timestamp(iso_timestamp) * 1000 + int(iso_timestamp[20:23])
+        except ValueError:
+            return None
+        return millis if cls.format(millis) == iso_timestamp else None
+
+    def _store(self, i: int, iso_timestamp: str) -> int:
+        millis = self.parse(iso_timestamp)
+        if millis is None:
+            self.exceptions[i] = iso_timestamp
+            return MISSING_TIMESTAMP
+        self.exceptions.pop(i, None)
+        return millis
+
+    def append(self, iso_timestamp: str):
+        self.millis.append(self._store(len(self.millis), iso_timestamp))
+
+    def __setitem__(self, i: int, iso_timestamp: str):
+        i = i % len(self.millis) if i < 0 else i
+        self.millis[i] = self._store(i, iso_timestamp)
+
+    def __getitem__(self, i: int) -> str:
+        i = i % len(self.millis) if i < 0 else i
+        millis = self.millis[i]
+        if i in self.exceptions:
+            return self.exceptions[i]
+        return self.format(millis)
+
+    def __len__(self):
+        return len(self.millis)
+
+
+def _column_property(columns: str, field: str) -> property:
+    # row attribute stored in a column of the table (columns: name of the table's columns dict)
+    def get(row):
+        return getattr(row._table, columns)[field][row._index]
+
+    def set(row, value):
+        getattr(row._table, columns)[field][row._index] = value
+
+    return property(get, set)
+
+
+class SpotifyStreamingRowMetadata(SpotifyProcessingMetadata):
+    """
+    Write-through view of the processing metadata of a table row: reading / setting an attribute reads / writes the table.
+    tracks is the list stored in the table (changes to it are kept); rows without tracks return a new empty list,
+    assign a list to set them
+    """
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "SpotifyStreamingTable", index: int):
+        self._table = table
+        self._index = index
+
+    @property
+    def tracks(self) -> List[TrackInfo]:
+        tracks = self._table.tracks[self._index]
+        return tracks if tracks is not None else []
+
+    @tracks.setter
+    def tracks(self, tracks: List[TrackInfo]):
+        self._table.tracks[self._index] = tracks or None
+
+
+class SpotifyStreamingRow(SpotifyStreamingEntry):
+    """
+    Write-through view of a table row, returned by table[i] / iteration: it behaves like a SpotifyStreamingEntry
+    and every change made through it (metadata included) is stored in the table
+    """
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "SpotifyStreamingTable", index: int):
+        self._table = table
+        self._index = index
+
+    @property
+    def ts(self) -> str:
+        return self._table.ts[self._index]
+
+    @ts.setter
+    def ts(self, ts: str):
+        self._table.ts[self._index] = ts
+
+    @property
+    def metadata(self) -> SpotifyProcessingMetadata:
+        return SpotifyStreamingRowMetadata(self._table, self._index)
+
+    @metadata.setter
+    def metadata(self, metadata: SpotifyProcessingMetadata):
+        for field, column in self._table.metadata_columns.items():
+            column[self._index] = getattr(metadata, field)
+        self._table.tracks[self._index] = metadata.tracks or None
+
+
+for _field in ENTRY_FIELDS:
+    setattr(SpotifyStreamingRow, _field, _column_property("columns", _field))
+for _field in METADATA_FIELDS:
+    setattr(SpotifyStreamingRowMetadata, _field, _column_property("metadata_columns", _field))
+
+
+class SpotifyStreamingTable:
+    """
+    Compact, columnar store of Spotify streaming entries: strings are dictionary-encoded and interned,
+    timestamps are an int array, constant fields are stored once.
+    It behaves like a list of SpotifyStreamingEntry (len / index / slice / iterate / append), so the stages working
+    on entry lists (converter, enricher, matcher, reporters, export_to_json) run over it. Rows are write-through views
+    (SpotifyStreamingRow): table[i].metadata.status = ... changes the table. Slices and appended entries are copies,
+    the tracks lists are shared
+    """
+    def __init__(self):
+        self.ts = TimestampColumn()
+        self.columns = {field: DictionaryColumn() for field in ENTRY_FIELDS}
+        self.metadata_columns = {field: DictionaryColumn() for field in METADATA_FIELDS}
+        self.tracks: List[Optional[List[TrackInfo]]] = []
+
+    def append(self, entry: SpotifyStreamingEntry):
+        self.ts.append(entry.ts)
+        for field, column in self.columns.items():
+            column.append(getattr(entry, field))
+        for field, column in self.metadata_columns.items():
+            column.append(getattr(entry.metadata, field))
+        self.tracks.append(entry.metadata.tracks or None)
+
+    def __setitem__(self, i: int, entry: SpotifyStreamingEntry):
+        self.ts[i] = entry.ts
+        for field, column in self.columns.items():
+            column[i] = getattr(entry, field)
+        for field, column in self.metadata_columns.items():
+            column[i] = getattr(entry.metadata, field)
+        self.tracks[i] = entry.metadata.tracks or None
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[SpotifyStreamingEntry, "SpotifyStreamingTable"]:
+        if isinstance(i, slice):
+            return self.from_entries(self[j] for j in range(*i.indices(len(self))))
+
+        if not -len(self) <= i < len(self):
+            raise IndexError("table index out of range")
+        return SpotifyStreamingRow(self, i % len(self))
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def __iter__(self) -> Iterator[SpotifyStreamingEntry]:
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def timestamps(self) -> Tuple[array, Set[int]]:
+        """
+        Unix timestamps (ms) of all rows, and the indexes of the rows without one (timestamps stored as-is,
+        MISSING_TIMESTAMP in the array)
+        """
+        return self.ts.millis, set(self.ts.exceptions)
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[SpotifyStreamingEntry]):
+        table = cls()
+        for entry in entries:
+            table.append(entry)
+        return table
+
+    @classmethod
+    def from_ytm_tracks(cls, ytm_tracks: Iterable[YTMProcessedTrack], additional_data: SpotifyAdditionalYTMData = None):
+        return cls.from_entries(SpotifyStreamingEntry.from_ytm_track(ytm_track, additional_data) for ytm_track in ytm_tracks)
@@ -0,0 +1,94 @@
+import re
+from typing import Dict, List, Tuple
+
+from rapidfuzz import fuzz, utils
+
+from spotify.constants import TITLE_CLUSTER_MIN_SCORE
+from spotify.local_catalog import DIGITS_PATTERN
+
+# separators of artist credits ("A & B", "B, A", "A x B"...)
+ARTIST_SEPARATORS = re.compile(r"\s*(?:,|&|/|\+|\bx\b|\band\b|\bwith\b)\s*")
+# version tags, in the "(tag)" form of the normalized titles
+VERSION_TAG = re.compile(r"\s*\(([^()]*)\)")
+
+
+def get_artist_key(artist_name: str) -> str:
+    """
+    Artist credits in a fixed order, so that reordered credits are the same
+    """
+    return " & ".join(sorted(filter(None, ARTIST_SEPARATORS.split(artist_name))))
+
+
+def get_base_title(track_name: str) -> str:
+    """
+    Title without its version tags, compared by similarity (the tags themselves must be the same, see get_version_tags)
+    """
+    return VERSION_TAG.sub("", track_name).strip() or track_name
+
+
+def get_version_tags(track_name: str) -> List[str]:
+    """
+    Version tags of a normalized title: the tags of the same recording (remasters, explicit, feature credits...) are
+    already removed by the normalization, the remaining ones (live, remix, sped up, reprise...) can be other recordings
+    """
+    return [tag.strip() for tag in VERSION_TAG.findall(track_name)]
+
+
+class TitleCluster:
+    """
+    Normalized (title, artist) searches of the same recording: only the representative (most played) is searched
+    """
+    __slots__ = ("representative", "base_title", "version_tags", "members")
+
+    def __init__(self, representative: Tuple[str, str], plays: int):
+        self.representative = representative
+        self.base_title = get_base_title(representative[0])
+        self.version_tags = get_version_tags(representative[0])
+        self.members: Dict[Tuple[str, str], int] = {representative: plays}
+
+    def is_similar(self, track_name: str) -> bool:
+        # same numbers required: "part 1" / "part 2" are different songs; same version tags: "(live)" / "(sped up)" too
+        base_title = get_base_title(track_name)
+        return (get_version_tags(track_name) == self.version_tags
+                and fuzz.ratio(base_title, self.base_title, processor=utils.default_process) >= TITLE_CLUSTER_MIN_SCORE
+                and DIGITS_PATTERN.findall(base_title) == DIGITS_PATTERN.findall(self.base_title))
+
+    def to_dict(self):
+        return {
+            "track_name": self.representative[0],
+            "artist_name": self.representative[1],
+            "plays": sum(self.members.values()),
+            "members": [{"track_name": track_name, "artist_name": artist_name, "plays": plays}
+                        for (track_name, artist_name), plays in self.members.items()]
+        }
+
+
+def cluster_search_terms(plays: Dict[Tuple[str, str], int]) -> List[TitleCluster]:
+    """
+    Group the searches (with their number of plays) blocked by artist credits + first word of the title, then by title
+    similarity, with the same version tags. The most played search of a cluster is its representative.
+    Searches without an artist are never grouped
+    """
+    clusters: List[TitleCluster] = []
+    blocks: Dict[Tuple[str, str], List[TitleCluster]] = {}
+    for search_terms, count in sorted(plays.items(), key=lambda item: (-item[1], item[0])):
+        track_name, artist_name = search_terms
+        base_title = get_base_title(track_name)
+        block = blocks.setdefault((get_artist_key(artist_name), base_title.split(" ", 1)[0]), []) if artist_name else []
+
+        cluster = next((cluster for cluster in block if cluster.is_similar(track_name)), None)
+        if cluster:
+            cluster.members[search_terms] = count
+        else:
+            cluster = TitleCluster(search_terms, count)
+            block.append(cluster)
+            clusters.append(cluster)
+
+    return clusters
+
+
+def get_search_aliases(clusters: List[TitleCluster]) -> Dict[Tuple[str, str], Tuple[str, str]]:
+    """
+    Search to run instead of each clustered search (its cluster representative)
+    """
+    return {member: cluster.representative for cluster in clusters for member in cluster.members if member != cluster.representative}
@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from utils.json_stream import iter_json_array
+
+
+@pytest.fixture
+def write_file(tmp_path):
+    def write(text: str) -> str:
+        path = tmp_path / "input.json"
+        path.write_text(text, encoding="utf-8")
+        return str(path)
+    return write
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("[]", []),
+    (" [ ] \n", []),
+    ('[1, {"a": [2, 3]}, "x"]\n\n', [1, {"a": [2, 3]}, "x"]),
+    ("\ufeff[{\"a\": 1}]", [{"a": 1}]),
+])
+def test_valid_arrays(write_file, text, expected):
+    assert list(iter_json_array(write_file(text), chunk_size=2)) == expected
+
+
+@pytest.mark.parametrize("text", ["[1,2,]", "[,]", "[1 2]", "[1,", "{}", '[1] garbage', '[1][2]', "[] ,"])
+def test_invalid_arrays(write_file, text):
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(write_file(text), chunk_size=2))
+
+
+def test_same_result_as_json_load(write_file):
+    items = [{"title": "Song " + "x" * i, "n": i} for i in range(50)]
+    input_file = write_file(json.dumps(items, indent=2))
+    assert list(iter_json_array(input_file, chunk_size=7)) == items
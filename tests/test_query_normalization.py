@@ -0,0 +1,33 @@
+import pytest
+
+from spotify.query_normalization import normalize_artist_name, normalize_track_name
+
+
+@pytest.mark.parametrize("track_name, expected", [
+    ("10 ft Tall", "10 ft tall"),
+    ("Thirteen ft. Under", "thirteen ft. under"),
+    ("Six Feet Under ft", "six feet under ft"),
+    ("Song feat Someone", "song feat someone"),
+    ("Ft. Lauderdale", "ft. lauderdale"),
+])
+def test_ft_as_a_word_is_kept(track_name, expected):
+    assert normalize_track_name(track_name) == expected
+
+
+@pytest.mark.parametrize("track_name, expected", [
+    ("Song (feat. Someone)", "song"),
+    ("Song [ft Someone]", "song"),
+    ("Song - feat Someone", "song"),
+    ("Song ft. Someone", "song"),
+    ("Song featuring Someone", "song"),
+    ("Song feat. Someone (Live)", "song (live)"),
+    ("6 ft. Deep feat. Someone", "6 ft. deep"),
+])
+def test_feature_credits_are_removed(track_name, expected):
+    assert normalize_track_name(track_name) == expected
+
+
+@pytest.mark.parametrize("text", ["...", "?!", "-"])
+def test_punctuation_only_names_are_kept(text):
+    assert normalize_track_name(text) == text
+    assert normalize_artist_name(text) == text
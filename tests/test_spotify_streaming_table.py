@@ -0,0 +1,31 @@
+from spotify.spotify_listening_history import SpotifyStreamingEntry
+from spotify.spotify_streaming_table import SpotifyStreamingTable
+
+
+def create_table(*timestamps: str) -> SpotifyStreamingTable:
+    return SpotifyStreamingTable.from_entries(SpotifyStreamingEntry(ts=ts) for ts in timestamps)
+
+
+def test_timestamps_are_unix_milliseconds():
+    millis, missing = create_table("2024-01-01T10:00:00.123Z", "1970-01-01T00:00:00.000Z").timestamps
+    assert list(millis) == [1704103200123, 0]
+    assert missing == set()
+
+
+def test_missing_timestamps_are_masked():
+    table = create_table("", "1969-12-31T23:59:59.999Z", "2024-01-01T10:00:00Z", "2024-01-01T10:00:00.000Z")
+    millis, missing = table.timestamps
+    # no sentinel value: the rows without a stored timestamp are only known from the mask
+    assert missing == {0, 1, 2}
+    assert millis[3] == 1704103200000
+    assert [row.ts for row in table] == ["", "1969-12-31T23:59:59.999Z", "2024-01-01T10:00:00Z", "2024-01-01T10:00:00.000Z"]
+
+
+def test_timestamps_follow_row_updates():
+    table = create_table("", "2024-01-01T10:00:00.000Z")
+    table[0].ts = "2024-01-01T09:00:00.000Z"
+    table[1].ts = "not a timestamp"
+    millis, missing = table.timestamps
+    assert missing == {1}
+    assert millis[0] == 1704099600000
+    assert table[1].ts == "not a timestamp"
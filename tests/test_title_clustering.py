@@ -0,0 +1,39 @@
+import pytest
+
+from spotify.query_normalization import normalize_track_name
+from spotify.title_clustering import cluster_search_terms, get_search_aliases
+
+
+def get_aliases(*titles: str, artist_name: str = "artist") -> dict:
+    # the first title is the most played one (the representative of its cluster)
+    plays = {(normalize_track_name(title), artist_name): len(titles) - i for i, title in enumerate(titles)}
+    return get_search_aliases(cluster_search_terms(plays))
+
+
+@pytest.mark.parametrize("variant", ["Song (sped up)", "Song (slowed + reverb)", "Song (reprise)", "Song (intro)"])
+def test_unknown_version_tags_are_not_clustered(variant):
+    assert get_aliases("Song", variant) == {}
+
+
+@pytest.mark.parametrize("variant", ["Song (Live)", "Song - Acoustic", "Song (Club Mix)"])
+def test_other_recordings_are_not_clustered(variant):
+    assert get_aliases("Song", variant) == {}
+
+
+@pytest.mark.parametrize("variant", ["Song (Remastered 2011)", "Song (feat. Someone)", "Song - Explicit"])
+def test_same_recording_tags_share_the_search(variant):
+    assert normalize_track_name(variant) == normalize_track_name("Song")
+
+
+def test_close_titles_with_the_same_tags_are_clustered():
+    assert get_aliases("Morning Sunshine (sped up)", "Morning Sunshines (Sped Up)") == {
+        ("morning sunshines (sped up)", "artist"): ("morning sunshine (sped up)", "artist")}
+
+
+def test_reordered_artist_credits_are_clustered():
+    plays = {("song", "a & b"): 2, ("song", "b, a"): 1}
+    assert get_search_aliases(cluster_search_terms(plays)) == {("song", "b, a"): ("song", "a & b")}
+
+
+def test_different_numbers_are_not_clustered():
+    assert get_aliases("Song Part 1", "Song Part 2") == {}
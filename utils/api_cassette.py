@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from utils.entry_files import encode_json_line, iter_entries
+from utils.simple_logger import print_log
+
+# Cassette modes (API_CASSETTE_MODE env setting)
+CASSETTE_MODE_RECORD = "record"
+CASSETTE_MODE_REPLAY = "replay"
+
+DEFAULT_CASSETTE_FILE = "output\\cassettes\\api.cassette.jsonl"
+
+# Request rate of the API clients while replaying (there is no server to protect, only the simulated latency)
+CASSETTE_REPLAY_REQUESTS_PER_SECOND = 10000.0
+
+
+class CassetteMissError(LookupError):
+    """
+    Replayed request that was not recorded in the cassette
+    """
+
+
+class ApiCassette:
+    """
+    Record / replay of API responses, for offline regression runs and benchmarks with real response shapes.
+    Responses are keyed on the call name + arguments and stored as JSON lines ({"key", "response"}).
+    Record mode calls the API and appends every new or changed response (later lines win when loading);
+    replay mode answers only from the cassette, without network, after latency_ms
+    """
+    def __init__(self, cassette_file: str, mode: str, latency_ms: float = 0.0):
+        if mode not in (CASSETTE_MODE_RECORD, CASSETTE_MODE_REPLAY):
+            raise ValueError(f"Unknown cassette mode '{mode}' (use {CASSETTE_MODE_RECORD} or {CASSETTE_MODE_REPLAY})")
+
+        self.cassette_file = cassette_file
+        self.mode = mode
+        self.latency_ms = latency_ms
+        self.responses = {}
+        self.lock = threading.Lock()
+        self.output = None
+
+        # counters
+        self.recorded = 0
+        self.replayed = 0
+        self.missed = 0
+
+        try:
+            for item in iter_entries(cassette_file):
+                self.responses[item["key"]] = item["response"]
+        except FileNotFoundError:
+            if mode == CASSETTE_MODE_REPLAY:
+                print_log(f"Error: Cassette {cassette_file} not found, record it first (API_CASSETTE_MODE={CASSETTE_MODE_RECORD})")
+                exit(1)
+        except (json.JSONDecodeError, KeyError) as e:
+            print_log(f"Error: Invalid cassette {cassette_file} ({e})")
+            exit(1)
+
+        if mode == CASSETTE_MODE_RECORD:
+            directory = os.path.dirname(cassette_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.output = open(cassette_file, 'ab')
+
+    def is_replaying(self) -> bool:
+        return self.mode == CASSETTE_MODE_REPLAY
+
+    @staticmethod
+    def get_key(name: str, args: tuple, kwargs: dict) -> str:
+        return f"{name} {json.dumps([list(args), kwargs], sort_keys=True, ensure_ascii=False, separators=(',', ':'))}"
+
+    def wrap(self, name: str, request_func: Callable) -> Callable:
+        """
+        Recording / replaying version of an API call (arguments and response must be JSON serializable)
+        """
+        def request(*args, **kwargs):
+            key = self.get_key(name, args, kwargs)
+
+            if self.mode == CASSETTE_MODE_REPLAY:
+                with self.lock:
+                    response = self.responses.get(key)
+                    if response is None:
+                        self.missed += 1
+                    else:
+                        self.replayed += 1
+                if response is None:
+                    raise CassetteMissError(f"No recorded response for {key}")
+                if self.latency_ms > 0:
+                    time.sleep(self.latency_ms / 1000)
+                return response
+
+            # errors are not recorded, only the responses
+            response = request_func(*args, **kwargs)
+            with self.lock:
+                if self.responses.get(key) != response:
+                    self.responses[key] = response
+                    self.output.write(encode_json_line({"key": key, "response": response}))
+                    self.output.flush()
+                    self.recorded += 1
+            return response
+
+        return request
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {"responses": len(self.responses), "recorded": self.recorded, "replayed": self.replayed, "missed": self.missed}
+
+    def log_stats(self):
+        stats = self.get_stats()
+        if self.mode == CASSETTE_MODE_REPLAY:
+            print_log(f"Cassette {self.cassette_file}: {stats['replayed']} responses replayed, {stats['missed']} requests not recorded")
+        else:
+            print_log(f"Cassette {self.cassette_file}: {stats['recorded']} responses recorded ({stats['responses']} in total)")
+
+    def close(self):
+        with self.lock:
+            if self.output:
+                self.output.close()
+                self.output = None
+
+
+def create_api_cassette_from_env() -> Optional[ApiCassette]:
+    """
+    API cassette from the API_CASSETTE_* settings (None unless API_CASSETTE_MODE is record or replay)
+    """
+    mode = os.getenv('API_CASSETTE_MODE', '').lower()
+    if not mode:
+        return None
+
+    cassette_file = os.getenv('API_CASSETTE_FILE') or DEFAULT_CASSETTE_FILE
+    latency_ms = float(os.getenv('API_CASSETTE_LATENCY_MS', 0))
+    return ApiCassette(cassette_file, mode, latency_ms)
@@ -0,0 +1,164 @@
+import json
+import os
+from contextlib import contextmanager
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+from utils.json_stream import iter_json_array
+
+# Optional encoders (pip install orjson / msgpack)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Intermediate file formats
+FORMAT_JSON = "json"        # single JSON array (default, human readable)
+FORMAT_JSONL = "jsonl"      # one JSON entry per line
+FORMAT_MSGPACK = "msgpack"  # binary, MSGPACK_MAGIC header followed by one msgpack object per entry
+
+MSGPACK_MAGIC = b"YTMPACK1\n"
+
+# File extension of each format
+FORMAT_EXTENSIONS = {FORMAT_JSON: ".json", FORMAT_JSONL: ".jsonl", FORMAT_MSGPACK: ".msgpack"}
+
+
+class EntriesDecodeError(json.JSONDecodeError):
+    """
+    Invalid msgpack entries file; a JSONDecodeError, so that the usual invalid file handling covers every format
+    """
+
+
+def get_intermediate_format() -> str:
+    """
+    INTERMEDIATE_FORMAT env setting: format of the files passed between the processing steps
+    """
+    output_format = os.getenv('INTERMEDIATE_FORMAT', FORMAT_JSON).lower()
+    if output_format not in (FORMAT_JSON, FORMAT_JSONL, FORMAT_MSGPACK):
+        raise ValueError(f"Unknown INTERMEDIATE_FORMAT '{output_format}' (use {FORMAT_JSON}, {FORMAT_JSONL} or {FORMAT_MSGPACK})")
+    if output_format == FORMAT_MSGPACK and not msgpack:
+        raise ValueError("INTERMEDIATE_FORMAT=msgpack requires the msgpack package (pip install msgpack)")
+    return output_format
+
+
+def detect_format(input_file: str) -> str:
+    """
+    Detect the format of an entries file from its first bytes
+    """
+    with open(input_file, 'rb') as file:
+        head = file.read(len(MSGPACK_MAGIC))
+        if head == MSGPACK_MAGIC:
+            return FORMAT_MSGPACK
+
+        # first non-whitespace character: '[' for a JSON array, '{' for JSON lines
+        while head:
+            for byte in head.lstrip(b"\xef\xbb\xbf \t\r\n"):
+                return FORMAT_JSON if byte == ord("[") else FORMAT_JSONL
+            head = file.read(4096)
+    return FORMAT_JSON
+
+
+def iter_entries_with_offsets(input_file: str, offset: int = 0) -> Iterator[Tuple[Optional[int], object]]:
+    """
+    Lazily read the entries of a file in any supported format, yielding (offset after the entry, entry).
+    For line-delimited / binary files reading can start at a byte offset previously yielded (resume);
+    JSON arrays can only be read from the start and yield None offsets.
+    A truncated last entry (interrupted write) is ignored for line-delimited / binary files
+    """
+    file_format = detect_format(input_file)
+
+    if file_format == FORMAT_JSON:
+        if offset:
+            raise ValueError(f"Cannot seek in {input_file}: JSON array files can only be read from the start")
+        for item in iter_json_array(input_file):
+            yield None, item
+        return
+
+    with open(input_file, 'rb') as file:
+        if file_format == FORMAT_MSGPACK:
+            if not msgpack:
+                raise ValueError(f"{input_file} is a msgpack file, which requires the msgpack package (pip install msgpack)")
+
+            start = max(offset, len(MSGPACK_MAGIC))
+            file.seek(start)
+            unpacker = msgpack.Unpacker(file, raw=False)
+            try:
+                for item in unpacker:
+                    yield start + unpacker.tell(), item
+            except msgpack.UnpackException as e:
+                raise EntriesDecodeError(f"Invalid msgpack data ({type(e).__name__})", "", start + unpacker.tell()) from e
+            return
+
+        file.seek(offset)
+        position = offset
+        for line in file:
+            position += len(line)
+            if not line.strip():
+                continue
+            if not line.endswith(b"\n"):
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:
+                    return # truncated last line
+            else:
+                item = json.loads(line)
+            yield position, item
+
+
+def iter_entries(input_file: str, offset: int = 0) -> Iterator[object]:
+    """
+    Lazily read the entries of a file in any supported format (JSON array, JSON lines, msgpack)
+    """
+    for _, item in iter_entries_with_offsets(input_file, offset):
+        yield item
+
+
+def read_entries(input_file: str) -> List[object]:
+    return list(iter_entries(input_file))
+
+
+def encode_json_line(item: dict) -> bytes:
+    if orjson:
+        try:
+            return orjson.dumps(item) + b"\n"
+        except TypeError:
+            pass
+    return json.dumps(item, ensure_ascii=False, separators=(",", ":")).encode('utf-8') + b"\n"
+
+
+@contextmanager
+def open_for_replace(output_file: str, mode: str = 'wb', **kwargs) -> Iterator[IO]:
+    """
+    Open a temporary file next to output_file, which replaces it only once fully written: an error while writing
+    leaves the previous file (if any) untouched instead of a truncated one
+    """
+    temp_file = f"{output_file}.tmp"
+    try:
+        with open(temp_file, mode, **kwargs) as output:
+            yield output
+        os.replace(temp_file, output_file)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+
+def write_entries(items: Iterable[object], output_file: str, output_format: str) -> int:
+    """
+    Stream entries (dicts or objects with to_dict) to a JSON lines or msgpack file; returns the number of entries written
+    """
+    count = 0
+    with open_for_replace(output_file, 'wb') as output:
+        if output_format == FORMAT_MSGPACK:
+            output.write(MSGPACK_MAGIC)
+            packer = msgpack.Packer()
+
+        for item in items:
+            item = item if isinstance(item, dict) else item.to_dict()
+            output.write(packer.pack(item) if output_format == FORMAT_MSGPACK else encode_json_line(item))
+            count += 1
+    return count
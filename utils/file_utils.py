@@ -1,12 +1,21 @@
 
+import itertools
 import json
 import os
 import platform
 import subprocess
-from typing import List, Optional
+import time
+from typing import Iterable, List, Optional
 
+from utils.entry_files import FORMAT_EXTENSIONS, FORMAT_JSON, get_intermediate_format, open_for_replace, write_entries
 from utils.simple_logger import print_log
 
+# Optional fast JSON encoder, used for exports when installed (pip install orjson)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 def generate_output_filename(input_filename: str, suffix="processed", separator=".", new_extension = None, parent_directory = "output") -> str:
     """
     Append a suffix to the input filename before the file extension.
@@ -19,24 +28,86 @@ def generate_output_filename(input_filename: str, suffix="processed", separator=
     output_file = os.path.join(output_dir, f"{os.path.basename(base_name)}{separator}{suffix}{new_extension or extension}")
     return output_file
 
-def export_to_json(data: List[object], input_filename: str, suffix="processed", separator=".", parent_directory = "output") -> Optional[str]:
+def get_delta_name(input_filename: str) -> str:
     """
-    Export filtered data to a JSON file with optional suffix
+    Base name of the output files of an incremental (--since-last-run) execution: the input name + the run time,
+    so that the outputs of the previous runs are never overwritten
     """
-    if not data or len(data) == 0:
+    return f"{os.path.splitext(os.path.basename(input_filename))[0]}.delta-{time.strftime('%Y%m%d-%H%M%S', time.localtime())}"
+
+def get_export_extension(intermediate: bool = False) -> str:
+    """
+    Extension of the files written by export_to_json: the INTERMEDIATE_FORMAT one for intermediate files, .json otherwise
+    """
+    return FORMAT_EXTENSIONS[get_intermediate_format() if intermediate else FORMAT_JSON]
+
+def is_compact_json_enabled() -> bool:
+    """
+    COMPACT_JSON_OUTPUT env setting: write JSON exports with one entry per line instead of pretty-printed
+    """
+    return os.getenv('COMPACT_JSON_OUTPUT', 'false').lower() in ('1', 'true', 'yes')
+
+def encode_json_item(item: object, compact: bool = False) -> str:
+    """
+    Serialize one exported item (dict or object with to_dict); pretty items are indented as array elements
+    """
+    item = item if isinstance(item, dict) else item.to_dict()
+
+    if orjson:
+        try:
+            encoded = orjson.dumps(item, option=0 if compact else orjson.OPT_INDENT_2).decode('utf-8')
+        except TypeError:
+            encoded = None # e.g. integers bigger than 64 bits - leave them to the standard encoder
+        if encoded is not None:
+            return encoded if compact else "  " + encoded.replace("\n", "\n  ")
+
+    if compact:
+        return json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+    return "  " + json.dumps(item, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+
+def write_json_array(items: Iterable[object], output_file: str, compact: bool = False) -> int:
+    """
+    Stream items to a JSON array file one at a time (constant extra memory, works with generators).
+    The pretty format is the same as json.dump(..., indent=2); the compact one has one item per line.
+    The file is only replaced once all the items are written (see open_for_replace).
+    Returns the number of items written
+    """
+    count = 0
+    with open_for_replace(output_file, 'w', encoding='utf-8') as output:
+        output.write("[")
+        for item in items:
+            output.write(",\n" if count else "\n")
+            output.write(encode_json_item(item, compact))
+            count += 1
+        output.write("\n]")
+    return count
+
+def export_to_json(data: Iterable[object], input_filename: str, suffix="processed", separator=".", parent_directory = "output", compact: Optional[bool] = None,
+                   intermediate: bool = False) -> Optional[str]:
+    """
+    Export filtered data to a JSON file with optional suffix.
+    Data can be any iterable (list, table, generator); entries are serialized one at a time.
+    compact defaults to the COMPACT_JSON_OUTPUT env setting.
+    intermediate files (only read by the next step) are written in the INTERMEDIATE_FORMAT env setting format
+    (JSON array by default, JSON lines or msgpack), with its extension; final / manually edited files are always .json JSON arrays
+    """
+    # Peek the first entry (generators have no length)
+    iterator = iter(data or [])
+    first = next(iterator, None)
+    if first is None:
         print_log(f"No data available for export: {input_filename} + '{suffix}'. Not writing anything.")
         return None
 
     # Create output filename
-    output_file = generate_output_filename(input_filename, suffix, separator, parent_directory=parent_directory)
+    output_format = get_intermediate_format() if intermediate else FORMAT_JSON
+    output_file = generate_output_filename(input_filename, suffix, separator, FORMAT_EXTENSIONS[output_format], parent_directory)
 
     try:
-        # Convert objects to dictionaries for JSON serialization
-        json_data = [(track if isinstance(track, dict) else track.to_dict()) for track in data]
-        
-        # Write filtered entries to output file
-        with open(output_file, 'w', encoding='utf-8') as output:
-            json.dump(json_data, output, indent=2, ensure_ascii=False)
+        # Write entries to output file, one at a time
+        if output_format == FORMAT_JSON:
+            write_json_array(itertools.chain([first], iterator), output_file, is_compact_json_enabled() if compact is None else compact)
+        else:
+            write_entries(itertools.chain([first], iterator), output_file, output_format)
         
         print_log(f"Data written to: {output_file}")
         return output_file
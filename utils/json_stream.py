@@ -0,0 +1,91 @@
+import json
+from typing import Iterator
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(input_file: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[object]:
+    """
+    Lazily iterate over the items of a top-level JSON array file, one item at a time.
+    Only the current item (and a read buffer of chunk_size characters) is kept in memory.
+
+    Raises:
+        json.JSONDecodeError: if the file is not a valid JSON array
+    """
+    decoder = json.JSONDecoder()
+
+    with open(input_file, 'r', encoding='utf-8') as file:
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buffer, pos, eof
+            if eof:
+                return False
+            chunk = file.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return True
+
+        def skip_whitespace() -> bool:
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buffer):
+                    return True
+                if not fill():
+                    return False
+
+        # Opening bracket (skip a possible UTF-8 BOM)
+        fill()
+        if buffer.startswith("\ufeff"):
+            pos = 1
+        if not skip_whitespace() or buffer[pos] != "[":
+            raise json.JSONDecodeError("Expected a top-level JSON array", buffer, pos)
+        pos += 1
+
+        expect_item = True
+        first_item = True
+        while True:
+            if not skip_whitespace():
+                raise json.JSONDecodeError("Unterminated JSON array", buffer, pos)
+
+            if buffer[pos] == "]":
+                # empty array, or end after an item (not after a trailing comma)
+                if expect_item and not first_item:
+                    raise json.JSONDecodeError("Trailing comma in JSON array", buffer, pos)
+                # nothing but whitespace may follow the array (like json.load)
+                pos += 1
+                if skip_whitespace():
+                    raise json.JSONDecodeError("Extra data after the JSON array", buffer, pos)
+                return
+
+            if not expect_item:
+                if buffer[pos] != ",":
+                    raise json.JSONDecodeError("Expected ',' between array items", buffer, pos)
+                pos += 1
+                expect_item = True
+                continue
+
+            # Decode next item; if it touches the end of the buffer it might be truncated, so read more
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                    if end < len(buffer) or eof:
+                        break
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill()
+
+            pos = end
+            expect_item = False
+            first_item = False
+            yield item
@@ -0,0 +1,118 @@
+import random
+import threading
+import time
+from typing import Optional
+
+from utils.simple_logger import print_log
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket with AIMD rate control, shared by all the requests to one API.
+    Every request takes a token (the bucket refills at `rate` tokens/s, up to `burst`); successful requests raise the
+    rate additively (up to max_rate), rate limiting answers cut it multiplicatively (down to min_rate) and pause every
+    caller for the Retry-After / backoff time. The rate is cut once per congestion event: the other rate limiting answers
+    of the requests sent before the cut, or received during the pause, only extend the pause. The increase resumes after
+    the pause; the limiter is considered cooling down for `cooldown` more seconds (see is_cooling_down)
+    """
+    def __init__(self, rate: float, max_rate: float = None, min_rate: float = 0.5, burst: float = 1.0,
+                 increase: float = 0.5, decrease: float = 0.5, base_backoff: float = 1.0, cooldown: float = 30.0):
+        self.max_rate = max_rate or rate
+        self.min_rate = min_rate
+        self.rate = min(rate, self.max_rate)
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.base_backoff = base_backoff
+        self.cooldown = cooldown
+
+        self.lock = threading.Lock()
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.cooldown_until = 0.0
+        self.last_cut_at = float("-inf")
+
+        # counters
+        self.started_at = self.updated_at
+        self.requests = 0
+        self.rate_limited = 0
+        self.rate_cuts = 0
+        self.throttled_seconds = 0.0
+
+    def _refill(self, now: float):
+        # updated_at can be in the future (reserved tokens / pause): nothing to refill until then
+        now = max(now, self.updated_at)
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self) -> float:
+        """
+        Wait for a request slot. Tokens are reserved under the lock, so concurrent callers queue up in order.
+        Returns the time the request is sent (time.monotonic), for on_rate_limited
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(max(now, self.blocked_until))
+            self.tokens -= 1
+            wait_until = max(now, self.blocked_until, self.updated_at + max(0.0, -self.tokens) / self.rate)
+            self.requests += 1
+            self.throttled_seconds += wait_until - now
+
+        if wait_until > now:
+            time.sleep(wait_until - now)
+        return wait_until
+
+    def on_success(self):
+        with self.lock:
+            if time.monotonic() >= self.blocked_until:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None, attempt: int = 0, sent_at: Optional[float] = None) -> float:
+        """
+        Record a rate limiting answer: slow down (once per congestion event) and pause all the callers.
+        sent_at: time the request was sent (returned by acquire); answers to requests sent before the last cut do not cut again.
+        Returns the pause (Retry-After if given, otherwise exponential backoff), jitter included
+        """
+        if retry_after:
+            pause = retry_after + random.uniform(0.1, 0.5)
+        else:
+            pause = self.base_backoff * (2 ** attempt) + random.uniform(0.1, 1.0)
+
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            same_event = now < self.blocked_until or (sent_at is not None and sent_at < self.last_cut_at)
+            if not same_event:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.last_cut_at = now
+                self.rate_cuts += 1
+            self.blocked_until = max(self.blocked_until, now + pause)
+            self.cooldown_until = self.blocked_until + self.cooldown
+            self.rate_limited += 1
+
+        return pause
+
+    def is_cooling_down(self) -> bool:
+        """
+        True until `cooldown` seconds after the end of the last rate limiting pause
+        """
+        with self.lock:
+            return time.monotonic() < self.cooldown_until
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            elapsed = time.monotonic() - self.started_at
+            return {
+                "rate": self.rate,
+                "requests": self.requests,
+                "requests_per_second": self.requests / elapsed if elapsed > 0 else 0.0,
+                "rate_limited": self.rate_limited,
+                "rate_cuts": self.rate_cuts,
+                "throttled_seconds": self.throttled_seconds
+            }
+
+    def log_stats(self, name: str):
+        stats = self.get_stats()
+        print_log(f"{name} rate limiter: {stats['requests']} requests ({stats['requests_per_second']:.2f}/s), "
+                  f"{stats['rate_limited']} rate limited ({stats['rate_cuts']} rate cuts), {stats['throttled_seconds']:.1f}s spent waiting, current rate {stats['rate']:.2f}/s")
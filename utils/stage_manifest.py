@@ -0,0 +1,137 @@
+import ast
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+from utils.file_utils import generate_output_filename
+from utils.simple_logger import print_log
+
+MANIFESTS_DIRECTORY = "output\\manifests"
+
+
+def hash_file(file_path: str) -> Optional[str]:
+    """
+    SHA-256 of a file's contents (None if the file does not exist)
+    """
+    if not os.path.exists(file_path):
+        return None
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_code(code_files: List[str]) -> str:
+    """
+    Code version of a stage: combined hash of the source files it depends on
+    """
+    digest = hashlib.sha256()
+    for code_file in sorted(code_files):
+        digest.update(code_file.encode('utf-8'))
+        digest.update((hash_file(code_file) or "").encode('utf-8'))
+    return digest.hexdigest()
+
+
+def get_module_file(module: str, root_directory: str) -> Optional[str]:
+    """
+    Source file of a module of the scripts directory (None for standard library / installed packages)
+    """
+    path = os.path.join(root_directory, *module.split("."))
+    for candidate in (f"{path}.py", os.path.join(path, "__init__.py")):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def get_code_files(scripts: Iterable[str], root_directory: str) -> List[str]:
+    """
+    Source files the scripts depend on: the scripts and every module of the scripts directory they import,
+    directly or not (imports inside functions included), found by parsing the sources without importing them
+    """
+    pending = [os.path.join(root_directory, script) for script in scripts]
+    code_files = set()
+    while pending:
+        code_file = pending.pop()
+        if code_file in code_files or not os.path.isfile(code_file):
+            continue
+        code_files.add(code_file)
+
+        with open(code_file, 'r', encoding='utf-8') as file:
+            tree = ast.parse(file.read(), code_file)
+
+        package = os.path.relpath(os.path.dirname(code_file), root_directory).replace(os.sep, ".").strip(".")
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                base = node.module or ""
+                if node.level:
+                    parent = package.split(".")[:len(package.split(".")) - node.level + 1] if package else []
+                    base = ".".join(filter(None, parent + [base]))
+                # "from package import module" imports a module, "from module import name" a name
+                modules = [base] + [f"{base}.{alias.name}" if base else alias.name for alias in node.names]
+            else:
+                continue
+            pending.extend(filter(None, (get_module_file(module, root_directory) for module in modules if module)))
+
+    return sorted(code_files)
+
+
+def build_stage_manifest(stage: str, input_file: str, settings: Dict[str, object], code_files: List[str], output_files: List[str]) -> dict:
+    """
+    Everything a stage result depends on (input contents, settings, code) + the hashes of the outputs it produced
+    """
+    return {
+        "stage": stage,
+        "input_file": input_file,
+        "input_hash": hash_file(input_file),
+        "settings": {key: (None if value is None else str(value)) for key, value in sorted(settings.items())},
+        "code_hash": hash_code(code_files),
+        "outputs": {output_file: hash_file(output_file) for output_file in output_files if os.path.exists(output_file)}
+    }
+
+
+def get_manifest_filename(stage: str, input_file: str) -> str:
+    return generate_output_filename(input_file, f"{stage}.manifest", new_extension=".json", parent_directory=MANIFESTS_DIRECTORY)
+
+
+def is_stage_up_to_date(stage: str, input_file: str, settings: Dict[str, object], code_files: List[str]) -> bool:
+    """
+    A stage is up to date if its last manifest has the same input / settings / code hashes
+    and all the outputs it recorded are still on disk, unchanged
+    """
+    manifest_file = get_manifest_filename(stage, input_file)
+    if not os.path.exists(manifest_file):
+        return False
+
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as file:
+            previous = json.load(file)
+    except json.JSONDecodeError:
+        return False
+
+    current = build_stage_manifest(stage, input_file, settings, code_files, [])
+    for key in ("input_hash", "settings", "code_hash"):
+        if previous.get(key) != current[key]:
+            return False
+
+    outputs = previous.get("outputs", {})
+    return len(outputs) > 0 and all(hash_file(output_file) == output_hash for output_file, output_hash in outputs.items())
+
+
+def write_stage_manifest(stage: str, input_file: str, settings: Dict[str, object], code_files: List[str], output_files: List[str]) -> Optional[str]:
+    """
+    Record the stage inputs and produced outputs after a successful run
+    """
+    manifest_file = get_manifest_filename(stage, input_file)
+    try:
+        with open(manifest_file, 'w', encoding='utf-8') as output:
+            json.dump(build_stage_manifest(stage, input_file, settings, code_files, output_files), output, indent=2, ensure_ascii=False)
+        return manifest_file
+
+    except Exception as e:
+        print_log(f"Error writing to {manifest_file}: {e}")
+        return None
@@ -1,9 +1,29 @@
-
+import sys
 from datetime import datetime
 
+# Placeholder stored in timestamp arrays (see SpotifyStreamingTable.timestamps) for the missing / unparsed timestamps:
+# not a marker (it is a valid timestamp too), their indexes are returned separately
+MISSING_TIMESTAMP = 0
+
+# Python 3.11+ parses the Takeout 'Z' suffix natively (no string replace needed)
+_FROMISOFORMAT_SUPPORTS_Z = sys.version_info >= (3, 11)
+
+
+def parse_iso_timestamp(iso_timestamp: str) -> datetime:
+    """
+    Parse an ISO timestamp; the Takeout shape (YYYY-MM-DDTHH:MM:SS.fffZ) goes straight to fromisoformat when possible,
+    anything else falls back to the explicit UTC offset replacement
+    """
+    if _FROMISOFORMAT_SUPPORTS_Z:
+        try:
+            return datetime.fromisoformat(iso_timestamp)
+        except ValueError:
+            pass
+    return datetime.fromisoformat(iso_timestamp.replace('Z', '+00:00'))
+
 
 def convert_to_unix_timestamp(iso_timestamp):
     if iso_timestamp:
-        dt = datetime.fromisoformat(iso_timestamp.replace('Z', '+00:00'))
+        dt = parse_iso_timestamp(iso_timestamp)
         return int(dt.timestamp())
-    return None
\ No newline at end of file
+    return None
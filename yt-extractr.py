@@ -1,13 +1,27 @@
 import argparse
 import json
+import os
 
+from dotenv import load_dotenv
+from utils.api_cassette import CASSETTE_REPLAY_REQUESTS_PER_SECOND, create_api_cassette_from_env
 from utils.file_utils import export_to_json
+from utils.rate_limiter import RateLimiter
 from utils.simple_logger import print_log
-from ytm.constants import YTM_URL_PLAY_STATUS_OK
+from ytm.constants import YTM_MAX_RETRIES, YTM_REQUESTS_PER_SECOND, YTM_URL_PLAY_STATUS_OK
 from ytm.yt_client import YouTubeClient
 from ytm.ytm_watch_history import YTMWatchHistoryEntry
 
 
+def create_youtube_client_from_env() -> YouTubeClient:
+    """
+    YouTube Music client from the YTM_* and API_CASSETTE_* settings
+    """
+    cassette = create_api_cassette_from_env()
+    requests_per_second = float(os.getenv('YTM_REQUESTS_PER_SECOND', YTM_REQUESTS_PER_SECOND))
+    rate_limiter = RateLimiter(CASSETTE_REPLAY_REQUESTS_PER_SECOND if cassette and cassette.is_replaying() else requests_per_second)
+    return YouTubeClient(rate_limiter, cassette, int(os.getenv('YTM_MAX_RETRIES', YTM_MAX_RETRIES)))
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process YouTube Music watch history errors and fetch song details.")
     parser.add_argument("--file", required=True, help="Input JSON file containing watch history errors.")
@@ -23,7 +37,8 @@ if __name__ == "__main__":
 
     entries = [YTMWatchHistoryEntry.from_dict(row) for row in data]
 
-    client = YouTubeClient()
+    load_dotenv()
+    client = create_youtube_client_from_env()
 
     output_errors = []
     output_ok = []
@@ -50,6 +65,10 @@ if __name__ == "__main__":
             print_log(f"  ✓ Fetched song details: Title='{title}', Artist='{artist}'")
     
     print_log(f"Processed {len(entries)} entries: {len(output_ok)} OK, {len(output_errors)} errors")
+    client.rate_limiter.log_stats("YouTube Music")
+    if client.cassette:
+        client.cassette.log_stats()
+        client.cassette.close()
     export_to_json(output_ok, input_file, "fixed")
     export_to_json(output_errors, input_file, "errors", parent_directory="output\\errors")
 
@@ -1,2 +1,6 @@
 YTM_INVALID_ARTIST = "release"
-YTM_URL_PLAY_STATUS_OK = "OK"
\ No newline at end of file
+YTM_URL_PLAY_STATUS_OK = "OK"
+
+# YouTube Music API rate limiting (token bucket + AIMD, see utils/rate_limiter.py), defaults of the YTM_* env settings
+YTM_REQUESTS_PER_SECOND = 2.0
+YTM_MAX_RETRIES = 3
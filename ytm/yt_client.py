@@ -1,12 +1,39 @@
 import re
+from typing import Optional
+from requests import HTTPError
 from ytmusicapi import YTMusic
+from ytmusicapi.exceptions import YTMusicServerError
 
+from utils.api_cassette import CASSETTE_REPLAY_REQUESTS_PER_SECOND, ApiCassette
+from utils.rate_limiter import RateLimiter
 from utils.simple_logger import print_log
+from ytm.constants import YTM_MAX_RETRIES, YTM_REQUESTS_PER_SECOND
 from ytm.ytm_watch_history import YTMWatchHistoryEntry
 
+# status of the YTMusicServerError messages ("Server returned HTTP 429: Too Many Requests. ...")
+SERVER_ERROR_STATUS = re.compile(r"^Server returned HTTP (\d{3})\b")
+
+
+def get_http_status(error: Exception) -> Optional[int]:
+    """HTTP status of a failed request (None if the error is not an HTTP error response)"""
+    if isinstance(error, HTTPError) and error.response is not None:
+        return error.response.status_code
+    if isinstance(error, YTMusicServerError):
+        # ytmusicapi only has the status in the message
+        match = SERVER_ERROR_STATUS.match(str(error))
+        return int(match.group(1)) if match else None
+    return None
+
 class YouTubeClient:
-    def __init__(self):
+    def __init__(self, rate_limiter: Optional[RateLimiter] = None, cassette: Optional[ApiCassette] = None, max_retries: int = YTM_MAX_RETRIES):
+        """cassette: records the song details responses, or replays them without network"""
         self.ytmusic = YTMusic()
+        self.max_retries = max_retries
+        self.cassette = cassette
+        self.get_song = cassette.wrap("ytmusic.get_song", self.ytmusic.get_song) if cassette else self.ytmusic.get_song
+
+        replaying = cassette and cassette.is_replaying()
+        self.rate_limiter = rate_limiter or RateLimiter(CASSETTE_REPLAY_REQUESTS_PER_SECOND if replaying else YTM_REQUESTS_PER_SECOND)
 
     def extract_video_id(self, url: str) -> str:
         """Extract YouTube video ID from a URL containing 'watch?v=<id>'"""
@@ -20,9 +47,17 @@ class YouTubeClient:
             print_log(f"No valid video ID found in URL {yt_url}")
             return {}
         
-        try:
-            song = self.ytmusic.get_song(video_id)
-            return song
-        except Exception as e:
-            print_log(f"Error fetching song for video ID {video_id}: {e}")
-            return {}
\ No newline at end of file
+        for attempt in range(self.max_retries):
+            try:
+                sent_at = self.rate_limiter.acquire()
+                song = self.get_song(video_id)
+                self.rate_limiter.on_success()
+                return song
+            except Exception as e:
+                if get_http_status(e) == 429 and attempt < self.max_retries - 1:
+                    sleep_time = self.rate_limiter.on_rate_limited(attempt=attempt, sent_at=sent_at)
+                    print_log(f"Rate limited. Backing off for {sleep_time:.1f} seconds...")
+                    continue
+                print_log(f"Error fetching song for video ID {video_id}: {e}")
+                return {}
+        return {}
\ No newline at end of file
@@ -4,6 +4,8 @@ from objects.constants import YT_MUSIC_HEADER, YT_MUSIC_TRACK_IDENTIFIER, YT_MUS
 from objects.process_metadata import ProcessingStatus, YTMProcessingMetadata
 
 class YTMWatchHistorySubtitleEntry:
+    __slots__ = ("name", "url")
+
     def __init__(self, name: str = "", url: str = ""):
         self.name = name
         self.url = url
@@ -22,6 +24,8 @@ class YTMWatchHistorySubtitleEntry:
         )
 
 class YTMWatchHistoryEntry:
+    __slots__ = ("header", "title", "titleUrl", "time", "products", "activityControls", "subtitles", "metadata")
+
     def __init__(self, 
                  header: str = "",
                  title: str = "",